@@ -0,0 +1,124 @@
+"""Chart aggregates per batch, read from the stored summary or computed in MongoDB."""
+import numpy as np
+
+from columnar import decode_chunks
+from enrich import AGG_COLUMNS, HIGH_RISK_LIFE_SCORE, LIFE_SCORE_BIN_WIDTH, LIFE_SCORE_BINS, BatchSummary
+
+# Same formula as enrich(), for batches stored without life_score
+LIFE_SCORE = {"$ifNull": ["$life_score", {"$max": [0, {"$min": [100, {"$subtract": [
+    100, {"$add": ["$thermal_score", {"$divide": ["$avg_sm_pct", 2]}]}]}]}]}]}
+# enrich.efficiency()
+EFFICIENCY = {"$divide": ["$avg_sm_pct", {"$max": [1, "$avg_power_watts"]}]}
+
+
+def batch_aggregates(db, batch_id):
+    """Return the chart aggregates of one batch (see BatchSummary.to_dict), or None.
+
+    Batches enriched at ingest already carry them in their batch_jobs header.
+    For older batches they are computed once, inside MongoDB for the rows
+    layout and chunk by chunk for the columnar one, and stored on the header
+    so the next call is a single lookup.
+    """
+    header = db["batch_jobs"].find_one({"_id": batch_id}, {"summary": 1, "layout": 1, "status": 1})
+    summary = header.get("summary") if header else None
+    if summary is not None and "efficiency" in summary:
+        return summary
+
+    layout = header.get("layout", "rows") if header else "rows"
+    if layout == "columnar":
+        summary = _columnar_summary(db, batch_id)
+    else:
+        summary = _pipeline_summary(db, batch_id)
+    if summary is None:
+        return None
+    if header is not None and header.get("status") == "done":
+        db["batch_jobs"].update_one({"_id": batch_id}, {"$set": {"summary": summary}})
+    return summary
+
+
+def _pipeline_summary(db, batch_id):
+    fields = {f"s{i}": {"$sum": f"${c}"} for i, c in enumerate(AGG_COLUMNS)}
+    for i, a in enumerate(AGG_COLUMNS):
+        for j in range(i, len(AGG_COLUMNS)):
+            fields[f"p{i}_{j}"] = {"$sum": {"$multiply": [f"${a}", f"${AGG_COLUMNS[j]}"]}}
+    life_bin = {"$min": [LIFE_SCORE_BINS - 1, {"$max": [0, {"$floor": {"$divide": ["$life_score", LIFE_SCORE_BIN_WIDTH]}}]}]}
+    pipeline = [
+        {"$match": {"batch_id": batch_id}},
+        {"$project": {"_id": 0, "life_score": LIFE_SCORE, **{c: 1 for c in AGG_COLUMNS[1:]},
+                      "cls": {"$ifNull": ["$Predicted_Class", "$health_class"]},
+                      "anomaly": {"$cond": [{"$eq": ["$Anomaly", -1]}, 1, 0]},
+                      "efficiency": EFFICIENCY}},
+        {"$facet": {
+            "moments": [{"$group": {"_id": None, "n": {"$sum": 1}, "anomalies": {"$sum": "$anomaly"},
+                                    "high_risk": {"$sum": {"$cond": [{"$lt": ["$life_score", HIGH_RISK_LIFE_SCORE]}, 1, 0]}},
+                                    "eff_sum": {"$sum": "$efficiency"},
+                                    "eff_sq": {"$sum": {"$multiply": ["$efficiency", "$efficiency"]}},
+                                    **fields}}],
+            "classes": [{"$group": {"_id": "$cls", "count": {"$sum": 1}}}],
+            "hist": [{"$group": {"_id": life_bin, "count": {"$sum": 1}}}],
+        }},
+    ]
+    result = next(db["classified_results"].aggregate(pipeline, allowDiskUse=True), None)
+    moments = result["moments"][0] if result and result["moments"] else None
+    if not moments or not moments["n"]:
+        return None
+
+    summary = BatchSummary()
+    summary.rows = moments["n"]
+    summary.high_risk = moments["high_risk"]
+    summary.anomalies = moments["anomalies"]
+    summary.efficiency[:] = (moments["eff_sum"], moments["eff_sq"])
+    summary.sums = np.array([moments[f"s{i}"] for i in range(len(AGG_COLUMNS))], dtype=np.float64)
+    for i in range(len(AGG_COLUMNS)):
+        for j in range(i, len(AGG_COLUMNS)):
+            summary.products[i, j] = summary.products[j, i] = moments[f"p{i}_{j}"]
+    summary.class_counts = {row["_id"]: row["count"] for row in result["classes"] if row["_id"] is not None}
+    for row in result["hist"]:
+        summary.hist[int(row["_id"])] = row["count"]
+    return summary.to_dict()
+
+
+def _columnar_summary(db, batch_id):
+    summary = BatchSummary()
+    columns = AGG_COLUMNS + ["Predicted_Class", "Anomaly"]
+    projection = {"_id": 0, "batch_id": 1, "seq": 1, **{f"columns.{c}": 1 for c in columns}}
+    for chunk in db["batch_chunks"].find({"batch_id": batch_id}, projection).sort("seq", 1):
+        df = decode_chunks([chunk])
+        if "life_score" not in df.columns:
+            df["life_score"] = (100 - (df["thermal_score"] + df["avg_sm_pct"] / 2)).clip(0, 100)
+        summary.add(df)
+    return summary.to_dict() if summary.rows else None
+
+
+def comparison_row(batch_id, summary, created_at=None):
+    """One batch's class mix, anomaly rate and efficiency from its aggregates."""
+    n = summary["rows"]
+    return {
+        "batch_id": batch_id,
+        "created_at": created_at,
+        "rows": n,
+        "class_counts": summary["class_counts"],
+        "class_share": {c: count / n for c, count in summary["class_counts"].items()} if n else {},
+        "anomalies": summary["anomalies"],
+        "anomaly_rate": summary["anomalies"] / n if n else None,
+        "mean_life_score": summary["mean_life_score"],
+        "efficiency_mean": summary["efficiency"]["mean"],
+        "efficiency_std": summary["efficiency"]["std"],
+    }
+
+
+def compare_batches(db, batch_ids):
+    """comparison_row() of every known batch in batch_ids, in order.
+
+    Built from batch_aggregates() only, so no batch is ever loaded into
+    memory: enriched batches are a header lookup and older ones are reduced
+    once inside MongoDB (allowDiskUse) or one columnar chunk at a time.
+    """
+    created = {h["_id"]: h.get("created_at")
+               for h in db["batch_jobs"].find({"_id": {"$in": list(batch_ids)}}, {"created_at": 1})}
+    rows = []
+    for batch_id in batch_ids:
+        summary = batch_aggregates(db, batch_id)
+        if summary is not None:
+            rows.append(comparison_row(batch_id, summary, created.get(batch_id)))
+    return rows
@@ -1,59 +1,474 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 from pymongo import MongoClient
+from pymongo.errors import PyMongoError
 import pandas as pd
-import joblib
 from datetime import datetime
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from aggregates import batch_aggregates, compare_batches
+from dedupe import IDEMPOTENCY_HEADER, IdempotencyConflict, UploadKeys, content_digest, new_batch_id, upload_keys
+from enrich import enrich, fit_anomaly_model, BatchSummary
+from history import GpuHistory
+from ingest import classify, iter_upload, stream_predict, upload_format, RequestStats, UploadError
+from metrics import (ERRORS, REQUEST_SECONDS, ROWS, UPLOAD_BYTES, UPLOAD_ROWS, RequestProfiler, log_event,
+                     mark_startup, render, stage, start_request, timed_iter)
+from model_server import ModelBundle, ModelLoader, MicroBatcher, current_version
+from parallel import ParallelClassifier
+from writer import BatchWriter
 
 app = Flask(__name__)
 CORS(app)
 
-# Load models
-kmeans = joblib.load("kmeans_model.joblib")
-scaler = joblib.load("scaler.joblib")
-label_mapping = joblib.load("label_mapping.joblib")
+# One JSON object per line (see metrics.log_event)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"), format="%(message)s")
+
+# With PROFILE_REQUESTS=1, a request sent with "X-Profile: 1" is profiled with
+# pyinstrument (pip install pyinstrument) and the HTML report is written to
+# PROFILE_DIR; the response's X-Profile-File header names it.
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") == "1"
+PROFILE_HEADER = "X-Profile"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "recore-profiles"))
+
+# Upload errors that surface while parsing rather than in upload_format/check_features
+PARSE_ERRORS = (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError)
+
+# Load models (once per process; with gunicorn.conf.py's preload_app they are
+# loaded in the master and shared copy-on-write by every worker)
+version, model_dir = current_version()
+
+
+# Concurrent small requests (/predict/json, uploads up to MICRO_BATCH_MAX_ROWS)
+# are merged into one kmeans call, waiting at most MICRO_BATCH_WAIT_MS.
+MICRO_BATCH_MAX_ROWS = int(os.environ.get("MICRO_BATCH_MAX_ROWS", "1024"))
+MICRO_BATCH_WAIT_MS = float(os.environ.get("MICRO_BATCH_WAIT_MS", "5"))
+
+# Frames of at least PARALLEL_MIN_ROWS rows are split across PARALLEL_WORKERS
+# processes (0 = classify on the request thread).
+PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", "0"))
+PARALLEL_MIN_ROWS = int(os.environ.get("PARALLEL_MIN_ROWS", "1000000"))
+
+
+def serve(bundle, model_dir):
+    # Every version gets its own micro-batcher and worker pool, so a request
+    # still holding an older bundle is classified by that version throughout.
+    bundle.batcher = MicroBatcher(bundle.predict_classes, max_rows=MICRO_BATCH_MAX_ROWS,
+                                  max_wait_ms=MICRO_BATCH_WAIT_MS)
+    if PARALLEL_WORKERS > 0:
+        bundle.parallel = ParallelClassifier(PARALLEL_WORKERS, model_dir)
+    return bundle
+
+
+def load_models():
+    bundle = serve(ModelBundle.load(model_dir, version=version).warm_up(), model_dir)
+    mark_startup("models")
+    return bundle
+
+
+# LAZY_STARTUP=1 loads and warms the models on a background thread instead,
+# so the process answers GET / and /metrics at once; requests that need a
+# model wait for it (see wait_for_models).
+LAZY_STARTUP = os.environ.get("LAZY_STARTUP", "0") == "1"
+model_loader = ModelLoader(load_models)
+models = None
+if LAZY_STARTUP:
+    model_loader.start()
+else:
+    models = load_models()
+
+# Versions promoted by retrain.py are swapped in without a restart: every
+# MODEL_POLL_SEC seconds a request checks model_versions/CURRENT.
+MODEL_POLL_SEC = float(os.environ.get("MODEL_POLL_SEC", "30"))
+_model_lock = threading.Lock()
+_model_checked = time.monotonic()
+
+
+def refresh_models():
+    global models, _model_checked
+    with _model_lock:
+        _model_checked = time.monotonic()
+        version, model_dir = current_version()
+        if version == models.version:
+            return False
+        old, models = models, serve(ModelBundle.load(model_dir, version=version), model_dir)
+        # its pool and batcher stop once the requests still holding it finish
+        old.retire()
+        return True
+
+
+def acquire_models():
+    # The bundle can be retired between reading `models` and acquiring it;
+    # the replacement is then already in place.
+    while True:
+        bundle = models
+        if bundle.acquire():
+            return bundle
 
-# Connect to MongoDB
-import os
 
+def predict_classes(X, bundle):
+    # Requests classify with the bundle they acquired, so a swap never splits
+    # one batch across model versions.
+    if len(X) <= MICRO_BATCH_MAX_ROWS:
+        return bundle.batcher.predict(X)
+    if bundle.parallel is not None and len(X) >= PARALLEL_MIN_ROWS:
+        return bundle.label_lookup[bundle.parallel.predict_clusters(X)]
+    return bundle.predict_classes(X)
+
+
+# Connect to MongoDB. One client (and connection pool) per process: with
+# connect=False nothing talks to the server until the first request, so a
+# gunicorn master importing this module forks no open sockets or monitor
+# threads into its workers.
 MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/recore_db")
-client = MongoClient(MONGO_URI)
+if MONGO_URI.startswith("mongomock://"):
+    # In-memory stand-in for local testing (pip install mongomock)
+    import mongomock
+    client = mongomock.MongoClient()
+else:
+    client = MongoClient(MONGO_URI, connect=False)
 
 db = client["processor_db"]
   # auto uses DB from URI
 
 collection = db["classified_results"]
+jobs = db["batch_jobs"]
+batch_chunks = db["batch_chunks"]
+
+# Streaming ingest: read the upload in fixed-size chunks instead of all at once.
+# Enabled per request with ?stream=1, or for every request with STREAM_INGEST=1.
+STREAM_INGEST = os.environ.get("STREAM_INGEST", "0") == "1"
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", "10000"))
+
+# Inserts run on a background thread (unordered, WRITE_BATCH_ROWS per call) so
+# /predict returns once classification is done. ASYNC_WRITES=0 writes inline.
+ASYNC_WRITES = os.environ.get("ASYNC_WRITES", "1") == "1"
+WRITE_BATCH_ROWS = int(os.environ.get("WRITE_BATCH_ROWS", "5000"))
+
+# STORAGE_LAYOUT=columnar stores each upload as a header (in batch_jobs) plus
+# column-packed chunks of COLUMNAR_CHUNK_ROWS rows; "rows" keeps one document per GPU.
+STORAGE_LAYOUT = os.environ.get("STORAGE_LAYOUT", "rows")
+COLUMNAR_CHUNK_ROWS = int(os.environ.get("COLUMNAR_CHUNK_ROWS", "5000"))
+# Store life_score, recommendations, anomaly labels and per-batch aggregates
+# with each upload so the dashboard does not recompute them per view.
+ENRICH_INGEST = os.environ.get("ENRICH_INGEST", "1") == "1"
+
+# Also keep every GPU's metrics per batch in gpu_history for trend queries
+HISTORY_INGEST = os.environ.get("HISTORY_INGEST", "1") == "1"
+history = GpuHistory(db)
+
+writer = BatchWriter(collection, jobs, batch_chunks, batch_rows=WRITE_BATCH_ROWS, background=ASYNC_WRITES,
+                     layout=STORAGE_LAYOUT, chunk_rows=COLUMNAR_CHUNK_ROWS,
+                     history=history if HISTORY_INGEST else None)
+
+# Re-uploads of the same bytes (for the same model version) return the
+# existing batch instead of classifying and storing it again; see dedupe.py.
+# A stalled batch whose keys a retry takes over is purged by the writer.
+DEDUPE_UPLOADS = os.environ.get("DEDUPE_UPLOADS", "1") == "1"
+uploads = UploadKeys(db, on_expired=writer.purge)
+
+
+# Endpoints that need the models / the database
+MODEL_ENDPOINTS = {"predict", "predict_json", "model_info", "reload_models"}
+NO_DB_ENDPOINTS = {"home", "metrics", "predict_json", "model_info", "reload_models"}
+# Endpoints that hold on to one model version for the whole request
+CLASSIFY_ENDPOINTS = {"predict", "predict_json"}
+_indexed_pid = None
+_first_response_pid = None
+
+
+@app.before_request
+def wait_for_models():
+    global models
+    if models is None and request.endpoint in MODEL_ENDPOINTS:
+        models = model_loader.get()
+
+
+@app.before_request
+def ensure_indexes():
+    # Once per process, on its first request that uses the database
+    global _indexed_pid
+    if _indexed_pid == os.getpid() or request.endpoint in NO_DB_ENDPOINTS:
+        return
+    # The dashboard fetches one batch at a time by batch_id
+    collection.create_index("batch_id")
+    writer.ensure_indexes()
+    uploads.ensure_indexes()
+    if HISTORY_INGEST:
+        history.ensure_collections()
+    _indexed_pid = os.getpid()
+
+
+@app.before_request
+def poll_models():
+    if models is not None and time.monotonic() - _model_checked >= MODEL_POLL_SEC:
+        refresh_models()
+
+
+@app.before_request
+def hold_models():
+    if request.endpoint in CLASSIFY_ENDPOINTS:
+        g.models = acquire_models()
+
+
+@app.teardown_request
+def release_models(exc):
+    bundle = g.pop("models", None)
+    if bundle is not None:
+        bundle.release()
+
+
+@app.before_request
+def start_timing():
+    g.start = time.perf_counter()
+    g.stages = start_request()
+    g.batch_id = None
+    g.profiler = None
+    if PROFILE_REQUESTS and request.headers.get(PROFILE_HEADER) == "1":
+        try:
+            g.profiler = RequestProfiler(PROFILE_DIR)
+        except ImportError:
+            log_event("profiler_unavailable", logging.WARNING, reason="pyinstrument is not installed")
+
+
+@app.after_request
+def finish_timing(response):
+    global _first_response_pid
+    if _first_response_pid != os.getpid():
+        _first_response_pid = os.getpid()
+        mark_startup("first_response")
+    if "start" not in g:
+        return response
+    elapsed = time.perf_counter() - g.start
+    endpoint = request.endpoint or "unknown"
+    if endpoint != "metrics":
+        REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(elapsed)
+    fields = {}
+    if g.profiler is not None:
+        fields["profile"] = g.profiler.finish(g.batch_id or endpoint)
+        response.headers["X-Profile-File"] = fields["profile"]
+    if endpoint not in ("metrics", "home"):
+        log_event("request", method=request.method, path=request.path, status=response.status_code,
+                  seconds=round(elapsed, 4), batch_id=g.batch_id,
+                  stages={k: round(v, 4) for k, v in g.stages.items()}, **fields)
+    return response
+
+
+def error_response(e, status):
+    endpoint = request.endpoint or "unknown"
+    ERRORS.labels(endpoint, type(e).__name__).inc()
+    if status >= 500:
+        log_event("error", logging.ERROR, exc_info=True, path=request.path, batch_id=g.get("batch_id"),
+                  error_type=type(e).__name__, error=str(e))
+    return jsonify({"error": str(e), "error_type": type(e).__name__}), status
+
+
+@app.errorhandler(PyMongoError)
+def database_unavailable(e):
+    # Raised outside a route's own handling, e.g. by ensure_indexes before
+    # the route runs: still a typed JSON 503, counted in recore_errors_total.
+    return error_response(e, 503)
 
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        file = request.files['file']
-        df = pd.read_csv(file)
+        file = request.files.get('file')
+        if file is None:
+            raise UploadError("no file uploaded (expected a multipart 'file' field)")
+        fmt = upload_format(file)
+        stats = RequestStats()
+        stream = request.args.get("stream", "1" if STREAM_INGEST else "0") == "1"
+        UPLOAD_BYTES.labels(fmt).inc(request.content_length or 0)
+        bundle = g.models
 
-        # Preprocessing
-        scaled_data = scaler.transform(df.values)
-        cluster_labels = kmeans.predict(scaled_data)
-        class_labels = [label_mapping[label] for label in cluster_labels]
+        # ✅ Assign batch ID for this upload
+        batch_id = g.batch_id = new_batch_id()
+        keys, digest = [], None
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if DEDUPE_UPLOADS or idempotency_key:
+            # The body is already buffered by werkzeug, so this is one sequential
+            # read; a duplicate then skips classification and storage entirely.
+            with stage("hash"):
+                digest = content_digest(file.stream)
+            keys = upload_keys(digest, bundle.version, idempotency_key, DEDUPE_UPLOADS)
+        writer.start_job(batch_id, content_sha256=digest, model_version=bundle.version)
+        if keys:
+            try:
+                existing = uploads.claim(keys, batch_id, digest)
+            except Exception:
+                writer.discard(batch_id)
+                raise
+            if existing is not None:
+                writer.discard(batch_id)
+                return duplicate_response(existing, fmt)
 
-        df['Predicted_Class'] = class_labels
+        summary = BatchSummary() if ENRICH_INGEST else None
+        anomaly_model = bundle.anomaly_model
 
-        # ✅ Assign batch ID for this upload
-        batch_id = datetime.utcnow().isoformat()
-        df["batch_id"] = batch_id
+        def process(df):
+            nonlocal anomaly_model
+            # Preprocessing ("classify" includes the scale/predict/label stages)
+            with stage("classify"):
+                classify(df, lambda X: predict_classes(X, bundle), bundle.features)
+            ROWS.labels("classify").inc(len(df))
+            if summary is not None:
+                with stage("enrich"):
+                    if anomaly_model is None and len(df):
+                        # No anomaly_model.joblib: fit once per upload on its first
+                        # STREAM_CHUNK_ROWS rows (the first chunk when streaming) and
+                        # reuse it, so flags are the same however the upload is split.
+                        anomaly_model = fit_anomaly_model(df.head(STREAM_CHUNK_ROWS))
+                    enrich(df, anomaly_model)
+                    summary.add(df)
+            df["batch_id"] = batch_id
+
+            # Save to MongoDB (queued; inline when ASYNC_WRITES=0)
+            with stage("submit"):
+                writer.submit(batch_id, df)
 
-        # Save to MongoDB
-        records = df.to_dict(orient="records")
-        collection.insert_many(records)
+        try:
+            if stream:
+                total_records = stream_predict(timed_iter(iter_upload(file, fmt, STREAM_CHUNK_ROWS), "parse"),
+                                               process, stats)
+            else:
+                df = next(timed_iter(iter_upload(file, fmt), "parse"))
+                process(df)
+                total_records = len(df)
+            writer.finish(batch_id, total_records, summary.to_dict() if summary else None)
+        except Exception as e:
+            writer.fail(batch_id, e)
+            raise
+        UPLOAD_ROWS.observe(total_records)
 
         return jsonify({
             "message": "success",
-            "total_records": len(records),
-            "batch_id": batch_id   # ✅ return batch id to frontend if needed
+            "duplicate": False,
+            "total_records": total_records,
+            "batch_id": batch_id,   # ✅ return batch id to frontend if needed
+            "job": f"/jobs/{batch_id}",
+            "stream": stream,
+            "format": fmt,
+            "summary": summary.to_dict() if summary else None,
+            **stats.report(total_records),
+            "stages": {k: round(v, 4) for k, v in g.stages.items()},
         }), 200
 
+    except (UploadError, *PARSE_ERRORS) as e:
+        return error_response(e, 400)
+    except IdempotencyConflict as e:
+        return error_response(e, 422)
+    except PyMongoError as e:
+        return error_response(e, 503)
+    except Exception as e:
+        return error_response(e, 500)
+
+
+def duplicate_response(job, fmt):
+    # The stored result of an identical earlier upload; 202 while it is still
+    # being classified (poll the job for the rest)
+    batch_id = g.batch_id = job["_id"]
+    return jsonify({
+        "message": "duplicate",
+        "duplicate": True,
+        "total_records": job.get("total_records"),
+        "batch_id": batch_id,
+        "job": f"/jobs/{batch_id}",
+        "status": job["status"],
+        "format": fmt,
+        "summary": job.get("summary"),
+    }), 200 if job["status"] in ("writing", "done") else 202
+
+
+@app.route('/predict/json', methods=['POST'])
+def predict_json():
+    # Score a few GPUs sent as JSON ({"rows": [{...}, ...]}, a list, or a
+    # single object) without storing them.
+    try:
+        payload = request.get_json(force=True, silent=True)
+        rows = payload.get("rows", payload) if isinstance(payload, dict) else payload
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise UploadError('expected JSON {"rows": [{...}, ...]}, a list of rows or a single row object')
+        bundle = g.models
+        missing = sorted({f for row in rows for f in bundle.features if row.get(f) is None})
+        if not rows or missing:
+            return jsonify({"error": "missing features", "missing": missing}), 400
+
+        df = pd.DataFrame(rows, columns=bundle.features)
+        classify(df, lambda X: predict_classes(X, bundle), bundle.features)
+        enrich(df, bundle.anomaly_model, fit_anomalies=False)
+        return jsonify({"message": "success", "results": df.to_dict(orient="records")}), 200
+
+    except UploadError as e:
+        return error_response(e, 400)
+    except Exception as e:
+        return error_response(e, 500)
+
+
+@app.route('/models', methods=['GET'])
+def model_info():
+    return jsonify({"version": models.version, "features": models.features,
+                    "classes": models.label_lookup.tolist()}), 200
+
+
+@app.route('/models/reload', methods=['POST'])
+def reload_models():
+    try:
+        swapped = refresh_models()
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return error_response(e, 500)
+    return jsonify({"version": models.version, "swapped": swapped}), 200
+
+
+@app.route('/jobs/<batch_id>', methods=['GET'])
+def job_status(batch_id):
+    job = writer.status(batch_id)
+    if job is None:
+        return jsonify({"error": "unknown batch_id"}), 404
+    return jsonify(job), 200
+
+
+@app.route('/jobs/<batch_id>/aggregates', methods=['GET'])
+def job_aggregates(batch_id):
+    summary = batch_aggregates(db, batch_id)
+    if summary is None:
+        return jsonify({"error": "unknown batch_id"}), 404
+    return jsonify({"batch_id": batch_id, **summary}), 200
+
+
+@app.route('/batches/compare', methods=['GET'])
+def batches_compare():
+    # ?batch_id=a&batch_id=b... (or a comma-separated list)
+    batch_ids = [b for arg in request.args.getlist("batch_id") for b in arg.split(",") if b]
+    if not batch_ids:
+        return jsonify({"error": "batch_id is required"}), 400
+    return jsonify({"batches": compare_batches(db, batch_ids)}), 200
+
+
+@app.route('/gpus/<gpu_id>/history', methods=['GET'])
+def gpu_history(gpu_id):
+    # GPU_ID is stored as uploaded, so "7" may be the number 7
+    ids = [gpu_id, int(gpu_id)] if gpu_id.lstrip("-").isdigit() else [gpu_id]
+    try:
+        start, end = (datetime.fromisoformat(request.args[k]) if request.args.get(k) else None
+                      for k in ("start", "end"))
+    except ValueError as e:
+        return jsonify({"error": f"start/end must be ISO timestamps: {e}"}), 400
+    trend = history.trend(ids, start, end)
+    for point in trend["points"]:
+        point["ts"] = point["ts"].isoformat()
+    return jsonify({"gpu_id": gpu_id, **trend}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    body, content_type = render()
+    return body, 200, {"Content-Type": content_type}
 
 
 @app.route('/', methods=['GET'])
@@ -61,6 +476,8 @@ def home():
     return "Backend Running", 200
 
 
+mark_startup("import")
+
 if __name__ == '__main__':
     app.run(debug=False, host="0.0.0.0", port=5000)
 
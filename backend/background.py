@@ -0,0 +1,45 @@
+"""Queues drained by a per-process background thread."""
+import os
+import queue
+import threading
+
+
+class LazyQueue:
+    """A queue.Queue plus the daemon thread that consumes it, started on first put().
+
+    Started lazily so that a gunicorn --preload master does not fork workers
+    with a queue whose thread only exists in the parent. `target` is called on
+    the thread with the underlying queue.Queue.
+    """
+
+    def __init__(self, target, name, maxsize=0):
+        self.target = target
+        self.name = name
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    def _get(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.maxsize)
+                    threading.Thread(target=self.target, args=(self._queue,), name=self.name, daemon=True).start()
+                    # Set last: other request threads skip the lock as soon as
+                    # they see this pid, so the queue must exist by then.
+                    self._pid = os.getpid()
+        return self._queue
+
+    def put(self, item):
+        self._get().put(item)
+
+    def close(self):
+        # Wakes the thread with None, which targets take as the signal to return.
+        if self._pid == os.getpid():
+            self._queue.put(None)
+
+    def join(self):
+        # Nothing to wait for if this process never started the thread.
+        if self._pid == os.getpid():
+            self._queue.join()
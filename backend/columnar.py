@@ -0,0 +1,71 @@
+"""Column-packed batch storage.
+
+Instead of one document per GPU row, a batch is stored as chunks of up to
+CHUNK_ROWS rows. Each chunk document holds every column once: numeric columns
+as the raw little-endian bytes of a NumPy array, everything else
+dictionary-encoded (distinct values + integer codes).
+
+    {"batch_id": ..., "seq": <row offset>, "rows": n,
+     "columns": {"avg_power_watts": {"dtype": "<f8", "data": Binary},
+                 "Predicted_Class": {"dtype": "category", "code_dtype": "<i2",
+                                     "categories": [...], "codes": Binary}}}
+"""
+import numpy as np
+import pandas as pd
+from bson.binary import Binary
+
+CHUNK_ROWS = 5000
+
+
+def encode_column(values):
+    if values.dtype.kind in "biuf":
+        array = np.ascontiguousarray(values.to_numpy())
+        return {"dtype": array.dtype.str, "data": Binary(array.tobytes())}
+
+    codes, categories = pd.factorize(values)
+    code_dtype = np.int16 if len(categories) < np.iinfo(np.int16).max else np.int32
+    codes = codes.astype(code_dtype)
+    return {
+        "dtype": "category",
+        "code_dtype": codes.dtype.str,
+        "categories": list(categories),
+        "codes": Binary(codes.tobytes()),
+    }
+
+
+def decode_column(column):
+    if column["dtype"] != "category":
+        return np.frombuffer(column["data"], dtype=column["dtype"])
+    codes = np.frombuffer(column["codes"], dtype=column["code_dtype"])
+    # factorize marks missing values with -1, which picks the trailing None
+    categories = np.array(column["categories"] + [None], dtype=object)
+    return categories[codes]
+
+
+def encode_chunks(df, batch_id, start_row=0, chunk_rows=CHUNK_ROWS):
+    columns = [c for c in df.columns if c != "batch_id"]
+    for offset in range(0, len(df), chunk_rows):
+        part = df.iloc[offset:offset + chunk_rows]
+        yield {
+            "batch_id": batch_id,
+            "seq": start_row + offset,
+            "rows": len(part),
+            "columns": {name: encode_column(part[name]) for name in columns},
+        }
+
+
+def decode_chunks(chunks, columns=None):
+    # `chunks` must be in seq order (find(...).sort("seq", 1)).
+    frames = []
+    for chunk in chunks:
+        data = {
+            name: decode_column(column)
+            for name, column in chunk["columns"].items()
+            if columns is None or name in columns
+        }
+        frame = pd.DataFrame(data)
+        frame["batch_id"] = chunk["batch_id"]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
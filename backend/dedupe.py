@@ -0,0 +1,131 @@
+"""Content-addressed, idempotent /predict uploads.
+
+An upload is identified by the SHA-256 of its bytes and the model version
+that classifies it. The first request claims that key in the upload_keys
+collection (the key is the document _id, so of two concurrent duplicates
+exactly one insert wins) and later ones are answered with the batch the
+claim points to. A client can also send an Idempotency-Key header, which is
+claimed the same way; reusing it for different content is an error.
+
+A key whose batch failed or no longer exists is taken over by the next
+upload, so a retry after a failure is classified again. So is a key whose
+batch is still unfinished but has made no progress for CLAIM_LEASE_MIN
+minutes (its worker most likely died); that batch is marked failed. Keys
+expire UPLOAD_KEY_TTL_DAYS after they were claimed (0 = never).
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from pymongo.errors import DuplicateKeyError
+
+HASH_BLOCK_BYTES = 1 << 20
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+CLAIM_LEASE_MIN = float(os.environ.get("CLAIM_LEASE_MIN", "10"))
+UPLOAD_KEY_TTL_DAYS = float(os.environ.get("UPLOAD_KEY_TTL_DAYS", "7"))
+
+
+class IdempotencyConflict(ValueError):
+    """An Idempotency-Key was reused for an upload with different content."""
+
+
+def new_batch_id(now=None):
+    # Upload time first, so batch ids still sort by time (latest_batch relies
+    # on that); the random suffix keeps uploads in the same microsecond apart.
+    return f"{(now or datetime.utcnow()).isoformat(timespec='microseconds')}-{uuid.uuid4().hex[:12]}"
+
+
+def content_digest(stream):
+    """SHA-256 hex digest of a seekable upload stream, rewound afterwards."""
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+def upload_keys(digest, model_version, idempotency_key=None, dedupe=True):
+    # The idempotency key goes first so reusing it for other content is
+    # reported even when that content is itself a duplicate.
+    keys = [f"idempotency:{idempotency_key}"] if idempotency_key else []
+    if dedupe:
+        keys.append(f"sha256:{digest}:{model_version}")
+    return keys
+
+
+def stalled(job, lease_min=CLAIM_LEASE_MIN, now=None):
+    """True if an unfinished job has not progressed for lease_min minutes."""
+    if job["status"] in ("done", "failed"):
+        return False
+    last = datetime.fromisoformat(job.get("updated_at") or job["created_at"])
+    return (now or datetime.utcnow()) - last > timedelta(minutes=lease_min)
+
+
+class UploadKeys:
+
+    def __init__(self, db, lease_min=CLAIM_LEASE_MIN, ttl_days=UPLOAD_KEY_TTL_DAYS, on_expired=None):
+        self.keys = db["upload_keys"]
+        self.jobs = db["batch_jobs"]
+        self.lease_min = lease_min
+        self.ttl_days = ttl_days
+        # called with the batch_id of a stalled batch whose key was taken over
+        # (e.g. BatchWriter.purge, to drop what it stored before it stopped)
+        self.on_expired = on_expired
+
+    def ensure_indexes(self):
+        if self.ttl_days > 0:
+            self.keys.create_index("created_at", expireAfterSeconds=int(self.ttl_days * 86400))
+
+    def claim(self, keys, batch_id, digest):
+        """Claim every key for batch_id (whose job header must already exist).
+
+        Returns None when all keys are now batch_id's, otherwise the job
+        document of the live batch that already holds one of them; keys
+        claimed before that are pointed at the same batch.
+        """
+        claimed = []
+        for key in keys:
+            try:
+                job = self._claim(key, batch_id, digest)
+            except IdempotencyConflict:
+                self.keys.delete_many({"_id": {"$in": claimed}, "batch_id": batch_id})
+                raise
+            if job is not None:
+                self.keys.update_many({"_id": {"$in": claimed}, "batch_id": batch_id},
+                                      {"$set": {"batch_id": job["_id"]}})
+                return job
+            claimed.append(key)
+        return None
+
+    def _claim(self, key, batch_id, digest):
+        while True:
+            try:
+                self.keys.insert_one({"_id": key, "batch_id": batch_id, "sha256": digest,
+                                      "created_at": datetime.utcnow()})
+                return None
+            except DuplicateKeyError:
+                holder = self.keys.find_one({"_id": key})
+            if holder is None:
+                continue  # released in between
+            if holder["sha256"] != digest:
+                raise IdempotencyConflict(f"{IDEMPOTENCY_HEADER} was already used for a different upload")
+            job = self.jobs.find_one({"_id": holder["batch_id"]})
+            if job is not None and job["status"] != "failed" and not stalled(job, self.lease_min):
+                return job
+            # The batch it names failed, stalled or is gone: take the key over,
+            # unless another request just did.
+            if self.keys.find_one_and_update({"_id": key, "batch_id": holder["batch_id"]},
+                                             {"$set": {"batch_id": batch_id, "created_at": datetime.utcnow()}}):
+                if job is not None and job["status"] != "failed":
+                    self._expire(job)
+                return None
+
+    def _expire(self, job):
+        # Only if it still has not moved, so a batch that just progressed is left alone
+        expired = self.jobs.update_one(
+            {"_id": job["_id"], "status": job["status"], "updated_at": job.get("updated_at")},
+            {"$set": {"status": "failed", "error": f"no progress for {self.lease_min:g} minutes"}})
+        if expired.modified_count and self.on_expired is not None:
+            self.on_expired(job["_id"])
@@ -0,0 +1,125 @@
+"""Columns and per-batch aggregates the dashboard used to derive on every view."""
+import numpy as np
+
+from rules import maintenance, recycling, workload
+
+ANOMALY_FEATURES = ["avg_power_watts", "avg_sm_pct", "avg_mem_pct"]
+HIGH_RISK_LIFE_SCORE = 30
+
+# Columns summarised per batch for the dashboard charts (life_score first)
+AGG_COLUMNS = ["life_score", "overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+               "avg_sm_pct", "avg_mem_pct", "thermal_score"]
+LIFE_SCORE_BIN_WIDTH = 5
+LIFE_SCORE_BINS = 100 // LIFE_SCORE_BIN_WIDTH
+
+
+def new_anomaly_model():
+    # sklearn.ensemble takes seconds to import; only needed without anomaly_model.joblib
+    from sklearn.ensemble import IsolationForest
+
+    return IsolationForest(contamination=0.1, random_state=42)
+
+
+def fit_anomaly_model(df):
+    return new_anomaly_model().fit(df[ANOMALY_FEATURES])
+
+
+def detect_anomalies(df, model=None):
+    """Return (labels, scores): -1 marks an anomaly, lower scores are more anomalous.
+
+    `model` is the pre-trained anomaly_model.joblib (see train_anomaly.py).
+    Without one, a model is fitted on df itself, so labels are relative to
+    that frame only.
+    """
+    if not len(df):
+        return np.ones(0, dtype=int), np.zeros(0)
+    features = df[ANOMALY_FEATURES]
+    if model is None:
+        model = fit_anomaly_model(df)
+    return model.predict(features), model.decision_function(features)
+
+
+def efficiency(df):
+    """SM utilisation per watt (power floored at 1 W), as in the dashboard's GPU comparison."""
+    return df["avg_sm_pct"].to_numpy(dtype=np.float64) / np.maximum(df["avg_power_watts"].to_numpy(dtype=np.float64), 1)
+
+
+def enrich(df, anomaly_model=None, fit_anomalies=True):
+    # fit_anomalies=False skips anomaly flags when there is no pre-trained
+    # model, e.g. for a handful of rows where a fitted model means nothing.
+    df["life_score"] = (100 - (df["thermal_score"] + df["avg_sm_pct"] / 2)).clip(0, 100)
+    df["Maintenance"] = maintenance(df)
+    df["Recycling"] = recycling(df)
+    df["Workload"] = workload(df)
+    if anomaly_model is not None or fit_anomalies:
+        df["Anomaly"], df["Anomaly_Score"] = detect_anomalies(df, anomaly_model)
+    return df
+
+
+class BatchSummary:
+    """Running aggregates over every enriched frame of one upload.
+
+    Besides the Health Summary figures it keeps the column sums, the sums of
+    pairwise products and a life-score histogram, which is all the
+    dashboard's charts need: means and the correlation matrix follow from
+    them without going back to the rows. The sum and sum of squares of
+    efficiency() give its mean and spread for comparing batches.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.high_risk = 0
+        self.anomalies = 0
+        self.class_counts = {}
+        self.sums = np.zeros(len(AGG_COLUMNS))
+        self.products = np.zeros((len(AGG_COLUMNS), len(AGG_COLUMNS)))
+        self.hist = np.zeros(LIFE_SCORE_BINS, dtype=np.int64)
+        self.efficiency = np.zeros(2)
+
+    def add(self, df):
+        X = df[AGG_COLUMNS].to_numpy(dtype=np.float64)
+        self.rows += len(X)
+        self.sums += X.sum(axis=0)
+        self.products += X.T @ X
+        self.hist += np.bincount(life_score_bins(X[:, 0]), minlength=LIFE_SCORE_BINS)
+        self.high_risk += int((X[:, 0] < HIGH_RISK_LIFE_SCORE).sum())
+        eff = efficiency(df)
+        self.efficiency += (eff.sum(), (eff * eff).sum())
+        if "Anomaly" in df.columns:
+            self.anomalies += int((df["Anomaly"] == -1).sum())
+        for name, count in df["Predicted_Class"].value_counts().items():
+            self.class_counts[name] = self.class_counts.get(name, 0) + int(count)
+
+    def to_dict(self):
+        n = self.rows
+        means = self.sums / n if n else np.full(len(AGG_COLUMNS), np.nan)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = self.products - n * np.outer(means, means)
+            std = np.sqrt(np.diag(cov))
+            corr = cov / np.outer(std, std)
+            eff_mean = self.efficiency[0] / n
+            eff_std = np.sqrt(max(self.efficiency[1] / n - eff_mean * eff_mean, 0))
+        return {
+            "rows": n,
+            "mean_life_score": float(means[0]) if n else None,
+            "class_counts": self.class_counts,
+            "most_common_class": max(self.class_counts, key=self.class_counts.get) if self.class_counts else None,
+            "high_risk": self.high_risk,
+            "anomalies": self.anomalies,
+            "means": {c: _finite(m) for c, m in zip(AGG_COLUMNS, means)},
+            # constant columns have no correlation; stored as None, not NaN
+            "corr": {"columns": AGG_COLUMNS,
+                     "matrix": [[_finite(v) for v in row] for row in np.clip(corr, -1, 1)]},
+            "life_score_hist": {"edges": list(range(0, 101, LIFE_SCORE_BIN_WIDTH)),
+                                "counts": self.hist.tolist()},
+            "efficiency": {"mean": _finite(eff_mean), "std": _finite(eff_std)},
+        }
+
+
+def life_score_bins(life_score):
+    """Histogram bin of each life score; 100 falls in the last bin."""
+    return np.clip(np.floor_divide(life_score, LIFE_SCORE_BIN_WIDTH), 0, LIFE_SCORE_BINS - 1).astype(np.int64)
+
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
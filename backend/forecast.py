@@ -0,0 +1,118 @@
+"""Remaining-useful-life forecasts: days until each GPU reaches the Recycle / Retire band.
+
+Each GPU's life score history (history.py) is fitted with a least-squares
+line. Only the per-GPU sums n, Σt, Σy, Σt², Σty are needed, so they are
+reduced inside MongoDB with one $group per history collection and the
+fit for the whole fleet is a handful of numpy array operations.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from rules import RECYCLING_RULES
+
+# Recycle / Retire is everything at or below the "partial recycling" threshold
+RETIRE_LIFE_SCORE = RECYCLING_RULES[1][1][0][2]
+# Shorter spans than this give a slope that is mostly noise
+MIN_SPAN_DAYS = 1.0
+
+STATS = ["n", "t", "y", "tt", "ty", "t_min", "t_max"]
+
+
+def _days_since(field, as_of):
+    return {"$divide": [{"$subtract": [field, as_of]}, 86400000]}
+
+
+def history_stats(history, as_of, gpu_ids=None, now=None):
+    """Per-GPU regression sums over every history point up to as_of.
+
+    Time is in days relative to as_of (so <= 0). Raw points count once;
+    daily rollups count once per point they replaced, at the start of
+    their day. Like GpuHistory.trend(), rollups are only read before
+    history.boundary() and raw points from it on, so no day counts twice.
+    Returns a DataFrame indexed by GPU_ID with the STATS columns.
+    """
+    boundary = history.boundary(now)
+    frames = []
+    sources = [
+        (history.points, "ts", {"$literal": 1}, "$life_score",
+         {"life_score": {"$ne": None}, "ts": {"$gte": boundary, "$lte": as_of}}),
+        (history.daily, "day", "$count", "$life_sum", {"day": {"$lt": boundary, "$lte": as_of}}),
+    ]
+    for coll, time_field, weight, life_sum, match in sources:
+        match = dict(match)
+        if gpu_ids is not None:
+            match["GPU_ID"] = {"$in": list(gpu_ids)}
+        rows = coll.aggregate([
+            {"$match": match},
+            {"$project": {"GPU_ID": 1, "t": _days_since(f"${time_field}", as_of), "w": weight, "s": life_sum}},
+            {"$group": {"_id": "$GPU_ID",
+                        "n": {"$sum": "$w"},
+                        "t": {"$sum": {"$multiply": ["$w", "$t"]}},
+                        "y": {"$sum": "$s"},
+                        "tt": {"$sum": {"$multiply": ["$w", "$t", "$t"]}},
+                        "ty": {"$sum": {"$multiply": ["$t", "$s"]}},
+                        "t_min": {"$min": "$t"},
+                        "t_max": {"$max": "$t"}}},
+        ], allowDiskUse=True)
+        frames.append(pd.DataFrame(list(rows), columns=["_id", *STATS]))
+
+    stats = pd.concat(frames, ignore_index=True).rename(columns={"_id": "GPU_ID"})
+    if stats.empty:
+        return pd.DataFrame(columns=STATS, index=pd.Index([], name="GPU_ID"), dtype=float)
+    return stats.groupby("GPU_ID").agg({"n": "sum", "t": "sum", "y": "sum", "tt": "sum", "ty": "sum",
+                                        "t_min": "min", "t_max": "max"})
+
+
+def points_stats(gpu_id, t, life_score):
+    """The same sums as history_stats() from in-memory arrays (t in days)."""
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(life_score, dtype=np.float64)
+    frame = pd.DataFrame({"GPU_ID": gpu_id, "n": 1.0, "t": t, "y": y, "tt": t * t, "ty": t * y,
+                          "t_min": t, "t_max": t})
+    return frame.groupby("GPU_ID").agg({"n": "sum", "t": "sum", "y": "sum", "tt": "sum", "ty": "sum",
+                                        "t_min": "min", "t_max": "max"})
+
+
+def fit_trends(stats):
+    """Slope (life score per day) and intercept of every GPU's line; NaN without enough history."""
+    n, t, y = (stats[c].to_numpy(dtype=np.float64) for c in ("n", "t", "y"))
+    tt, ty = stats["tt"].to_numpy(dtype=np.float64), stats["ty"].to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denom = n * tt - t * t
+        slope = (n * ty - t * y) / denom
+        intercept = (y - slope * t) / n
+    enough = (n >= 2) & ((stats["t_max"] - stats["t_min"]).to_numpy(dtype=np.float64) >= MIN_SPAN_DAYS)
+    slope[~enough] = np.nan
+    intercept[~enough] = np.nan
+    return pd.DataFrame({"slope_per_day": slope, "intercept": intercept, "points": n}, index=stats.index)
+
+
+def forecast(current, stats, as_of=None, threshold=RETIRE_LIFE_SCORE):
+    """Days until each GPU in `current` (GPU_ID, life_score) reaches `threshold`.
+
+    Starts from the GPU's life score in the current batch and follows its
+    fitted slope. GPUs already in the band get 0; GPUs that are not
+    declining get inf; GPUs without enough history get NaN.
+    """
+    fits = fit_trends(stats)
+    out = current[["GPU_ID", "life_score"]].join(fits, on="GPU_ID")
+    life = out["life_score"].to_numpy(dtype=np.float64)
+    slope = out["slope_per_day"].to_numpy(dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days = np.where(slope < 0, (life - threshold) / -slope, np.where(np.isnan(slope), np.nan, np.inf))
+    days[life <= threshold] = 0.0
+    out["days_to_retire"] = days
+    if as_of is not None:
+        finite = np.isfinite(days)
+        retire = np.full(len(days), np.datetime64("NaT"), dtype="datetime64[s]")
+        retire[finite] = np.datetime64(as_of, "s") + (days[finite] * 86400).astype("timedelta64[s]")
+        out["retire_date"] = retire
+    return out.reset_index(drop=True)
+
+
+def fleet_forecast(history, current, as_of=None):
+    """forecast() for every GPU in `current` from its stored history up to as_of."""
+    as_of = as_of or datetime.utcnow()
+    return forecast(current, history_stats(history, as_of), as_of)
@@ -0,0 +1,23 @@
+# gunicorn picks this file up when started from backend/:  gunicorn app:app
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+# Threads let concurrent small /predict and /predict/json calls in one worker
+# meet in the micro-batcher.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+
+# Import app.py, and with it the model artifacts, once in the master. Workers
+# inherit the loaded models copy-on-write instead of unpickling their own.
+# With LAZY_STARTUP=1 each worker imports the app itself and loads the models
+# in the background, so it answers sooner after a cold start.
+preload_app = os.environ.get("LAZY_STARTUP", "0") != "1"
+
+
+def child_exit(server, worker):
+    # Drop a dead worker's live gauges from the shared /metrics files
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
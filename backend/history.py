@@ -0,0 +1,169 @@
+"""Per-GPU metrics across batches, for life-score trends of a single GPU.
+
+Every stored row with a GPU_ID is also written as one point to the
+gpu_history time-series collection (timeField "ts", metaField "GPU_ID"),
+indexed by (GPU_ID, ts). Raw points expire after HISTORY_RAW_DAYS; before
+that, rollup() folds each complete day into one gpu_history_daily document
+per GPU (count, mean, min and max life score), so long histories stay cheap
+to query.
+
+Run `python history.py --rollup` from backend/ (e.g. daily from cron).
+"""
+import argparse
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+# Metrics copied into each history point besides life_score
+HISTORY_COLS = ["life_score", "usage_hours", "avg_power_watts", "thermal_score"]
+HISTORY_RAW_DAYS = int(os.environ.get("HISTORY_RAW_DAYS", "30"))
+
+
+def day_of(ts):
+    return datetime(ts.year, ts.month, ts.day)
+
+
+class GpuHistory:
+
+    def __init__(self, db, raw_days=HISTORY_RAW_DAYS):
+        self.db = db
+        self.points = db["gpu_history"]
+        self.daily = db["gpu_history_daily"]
+        self.meta = db["gpu_history_meta"]
+        self.raw_days = raw_days
+
+    def ensure_collections(self):
+        # A time-series collection where the server supports one (MongoDB 5+);
+        # otherwise a plain collection with a TTL index on ts does the same job.
+        if "gpu_history" not in self.db.list_collection_names():
+            try:
+                self.db.create_collection("gpu_history", timeseries={
+                    "timeField": "ts", "metaField": "GPU_ID", "granularity": "hours"},
+                    expireAfterSeconds=self.raw_days * 86400)
+            except (CollectionInvalid, OperationFailure, NotImplementedError, TypeError):
+                pass
+        self.points.create_index([("GPU_ID", ASCENDING), ("ts", ASCENDING)])
+        try:
+            self.points.create_index("ts", expireAfterSeconds=self.raw_days * 86400)
+        except OperationFailure:
+            pass  # time-series collections expire through expireAfterSeconds instead
+        self.daily.create_index([("GPU_ID", ASCENDING), ("day", ASCENDING)], unique=True)
+
+    def record(self, batch_id, ts, df):
+        """Insert one point per row of df; frames without GPU_ID are skipped."""
+        if "GPU_ID" not in df.columns or not len(df):
+            return 0
+        cols = [c for c in HISTORY_COLS if c in df.columns]
+        values = {c: df[c].tolist() for c in ["GPU_ID", *cols]}
+        classes = df["Predicted_Class"].tolist() if "Predicted_Class" in df.columns else [None] * len(df)
+        day = day_of(ts)
+        docs = [{"ts": ts, "day": day, "batch_id": batch_id, "Predicted_Class": cls, **dict(zip(values, row))}
+                for cls, *row in zip(classes, *values.values())]
+        self.points.insert_many(docs, ordered=False)
+        return len(docs)
+
+    def forget(self, batch_id):
+        # Points of a failed upload; on time-series collections this needs
+        # MongoDB 7+ (older servers only delete by metaField).
+        return self.points.delete_many({"batch_id": batch_id}).deleted_count
+
+    def rollup(self, now=None):
+        """Fold raw points of every complete day not rolled up yet into daily documents."""
+        end = day_of(now or datetime.utcnow())
+        state = self.meta.find_one({"_id": "rollup"}) or {}
+        start = state.get("through")
+        if start is None:
+            first = self.points.find_one({}, {"day": 1}, sort=[("ts", ASCENDING)])
+            if first is None:
+                return 0
+            start = first["day"]
+        if start >= end:
+            return 0
+
+        groups = self.points.aggregate([
+            {"$match": {"ts": {"$gte": start, "$lt": end}, "life_score": {"$ne": None}}},
+            {"$group": {"_id": {"GPU_ID": "$GPU_ID", "day": "$day"}, "count": {"$sum": 1},
+                        "life_sum": {"$sum": "$life_score"}, "life_min": {"$min": "$life_score"},
+                        "life_max": {"$max": "$life_score"}}},
+        ], allowDiskUse=True)
+        ops = [UpdateOne({"GPU_ID": g["_id"]["GPU_ID"], "day": g["_id"]["day"]},
+                         {"$inc": {"count": g["count"], "life_sum": g["life_sum"]},
+                          "$min": {"life_min": g["life_min"]},
+                          "$max": {"life_max": g["life_max"]}},
+                         upsert=True)
+               for g in groups]
+        for i in range(0, len(ops), 1000):
+            self.daily.bulk_write(ops[i:i + 1000], ordered=False)
+        self.meta.update_one({"_id": "rollup"}, {"$set": {"through": end}}, upsert=True)
+        return len(ops)
+
+    def boundary(self, now=None):
+        """Where the daily rollups end and the raw points take over.
+
+        Days before it come from gpu_history_daily, times from it on from
+        gpu_history: rolled-up days still inside the raw retention are in
+        both, so every reader must split at this point to count them once.
+        """
+        state = self.meta.find_one({"_id": "rollup"}) or {}
+        return min(day_of((now or datetime.utcnow()) - timedelta(days=self.raw_days)),
+                   state.get("through") or datetime.min)
+
+    def trend(self, gpu_id, start=None, end=None, now=None):
+        """Life score of one GPU over time, oldest first.
+
+        Days that are rolled up and older than the raw retention come from
+        gpu_history_daily (one point per day with min/max/count); newer ones
+        are the raw per-batch points. Both are (GPU_ID, time) index range
+        scans. gpu_id may be a list of equivalent ids (e.g. 7 and "7").
+        """
+        ids = {"$in": list(gpu_id)} if isinstance(gpu_id, (list, tuple)) else gpu_id
+        boundary = self.boundary(now)
+
+        points = []
+        if start is None or start < boundary:
+            query = {"GPU_ID": ids, "day": {"$lt": boundary if end is None else min(boundary, end)}}
+            if start is not None:
+                query["day"]["$gte"] = day_of(start)
+            for d in self.daily.find(query, {"_id": 0}).sort("day", ASCENDING):
+                points.append({"ts": d["day"], "life_score": d["life_sum"] / d["count"], "life_min": d["life_min"],
+                               "life_max": d["life_max"], "count": d["count"], "rollup": True})
+
+        query = {"GPU_ID": ids, "ts": {"$gte": max(boundary, start) if start is not None else boundary}}
+        if end is not None:
+            query["ts"]["$lt"] = end
+        projection = {"_id": 0, "ts": 1, "batch_id": 1, "Predicted_Class": 1, **{c: 1 for c in HISTORY_COLS}}
+        for p in self.points.find(query, projection).sort("ts", ASCENDING):
+            points.append({**p, "count": 1, "rollup": False})
+
+        return {"points": points, "life_score_per_day": life_score_slope(points)}
+
+
+def life_score_slope(points):
+    """Least-squares change in life score per day over the given points, or None."""
+    pts = [(p["ts"], p["life_score"]) for p in points if p.get("life_score") is not None]
+    if len(pts) < 2:
+        return None
+    t = np.array([(ts - pts[0][0]).total_seconds() / 86400 for ts, _ in pts])
+    y = np.array([life for _, life in pts], dtype=np.float64)
+    if np.ptp(t) < 1:
+        return None  # less than a day apart: the slope would be noise
+    return float(np.polyfit(t, y, 1)[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rollup", action="store_true", help="roll up complete days into gpu_history_daily")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/recore_db"))
+    history = GpuHistory(client["processor_db"])
+    history.ensure_collections()
+    if args.rollup:
+        print("Rolled up", history.rollup(), "GPU-days")
+
+
+if __name__ == "__main__":
+    main()
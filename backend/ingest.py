@@ -0,0 +1,165 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import psutil
+
+
+def build_label_lookup(label_mapping):
+    # label_mapping is {cluster_id: class_name}; as an array it can be indexed
+    # with the whole kmeans.predict output in one go.
+    lookup = np.empty(max(label_mapping) + 1, dtype=object)
+    for cluster_id, class_name in label_mapping.items():
+        lookup[cluster_id] = class_name
+    return lookup
+
+
+# Upload formats, picked by content type first and file extension second.
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/vnd.apache.arrow.file": "arrow",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/x-feather": "feather",
+}
+EXTENSIONS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".arrows": "arrow",
+    ".ipc": "arrow",
+    ".feather": "feather",
+}
+
+
+class UploadError(ValueError):
+    """The upload cannot be classified (bad format or feature columns)."""
+
+
+def upload_format(file):
+    fmt = CONTENT_TYPES.get(file.mimetype)
+    if fmt is None:
+        fmt = EXTENSIONS.get(os.path.splitext(file.filename or "")[1].lower(), "csv")
+    return fmt
+
+
+def _arrow_table(file, fmt):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # Wrap the uploaded bytes without copying; the table's columns are views
+    # into this buffer until to_pandas() materialises a chunk.
+    buffer = pa.py_buffer(file.read())
+    if fmt == "feather":
+        return feather.read_table(pa.BufferReader(buffer), memory_map=False)
+    try:
+        return pa.ipc.open_file(buffer).read_all()
+    except pa.ArrowInvalid:
+        return pa.ipc.open_stream(buffer).read_all()
+
+
+def iter_upload(file, fmt, chunk_rows=None):
+    """Yield the upload as DataFrames of at most chunk_rows rows (one frame if None)."""
+    if fmt == "csv":
+        if chunk_rows is None:
+            yield pd.read_csv(file)
+        else:
+            yield from pd.read_csv(file, chunksize=chunk_rows)
+    elif fmt in ("parquet", "arrow", "feather"):
+        import pyarrow as pa
+
+        try:
+            yield from _iter_arrow_upload(file, fmt, chunk_rows)
+        except pa.ArrowException as e:
+            # a truncated or corrupt file, not a server error
+            raise UploadError(f"unreadable {fmt} upload: {e}") from e
+    else:
+        raise UploadError(f"unsupported upload format: {fmt}")
+
+
+def _iter_arrow_upload(file, fmt, chunk_rows):
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        if chunk_rows is None:
+            yield pq.read_table(file).to_pandas()
+        else:
+            for batch in pq.ParquetFile(file).iter_batches(batch_size=chunk_rows):
+                yield batch.to_pandas()
+    else:
+        table = _arrow_table(file, fmt)
+        step = chunk_rows or table.num_rows
+        if table.num_rows == 0:
+            yield table.to_pandas()
+        for offset in range(0, table.num_rows, step):
+            yield table.slice(offset, step).to_pandas()
+
+
+def check_features(df, features):
+    missing = [f for f in features if f not in df.columns]
+    if missing:
+        raise UploadError(f"missing feature columns: {', '.join(missing)}")
+    non_numeric = [f for f in features if not pd.api.types.is_numeric_dtype(df[f])]
+    if non_numeric:
+        raise UploadError(f"non-numeric feature columns: {', '.join(non_numeric)}")
+
+
+def classify(df, predict_classes, features):
+    # predict_classes: feature matrix -> class names (scaler, kmeans and the
+    # label lookup in one step, see ModelBundle.predict_classes). Columns
+    # are passed in the order the scaler was fitted with; any extra columns
+    # (e.g. GPU_ID) are kept and stored as they are.
+    check_features(df, features)
+    df["Predicted_Class"] = predict_classes(df[features].to_numpy(dtype=np.float64))
+    return df
+
+
+def iter_documents(df):
+    # Build documents straight from column arrays. tolist() converts each
+    # column to native Python scalars in C, so the dicts are BSON-ready
+    # without going through df.to_dict(orient="records").
+    columns = list(df.columns)
+    values = [df[c].tolist() for c in columns]
+    for row in zip(*values):
+        yield dict(zip(columns, row))
+
+
+def stream_predict(chunks, process, stats):
+    # Process the upload one chunk at a time (see iter_upload) so memory stays
+    # flat no matter how many rows it has.
+    total = 0
+    for chunk in chunks:
+        process(chunk)
+        total += len(chunk)
+        stats.sample()
+    return total
+
+
+class RequestStats:
+    """Wall time and peak RSS of a single /predict call.
+
+    RSS is sampled at the start, after every chunk and at the end, which is
+    where the working set is largest.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self.peak_rss = 0
+        self.sample()
+        self.start = time.perf_counter()
+
+    def sample(self):
+        self.peak_rss = max(self.peak_rss, self._process.memory_info().rss)
+
+    def report(self, rows):
+        self.sample()
+        elapsed = time.perf_counter() - self.start
+        return {
+            "elapsed_sec": round(elapsed, 4),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+            "peak_rss_mb": round(self.peak_rss / (1024 * 1024), 1),
+        }
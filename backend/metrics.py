@@ -0,0 +1,121 @@
+"""Prometheus metrics, per-request stage timings and structured logs for the backend.
+
+stage("name") times a block of the hot path. Every timing goes to the
+recore_stage_seconds histogram; timings taken on the request's own thread
+are also collected for that request's log line (work done on the writer or
+micro-batcher threads only shows up in the histograms).
+
+Under gunicorn with several workers, set PROMETHEUS_MULTIPROC_DIR to an
+empty directory so /metrics reports all workers, not just the one that
+answered.
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+import psutil
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+
+logger = logging.getLogger("recore")
+
+STAGE_SECONDS = Histogram(
+    "recore_stage_seconds", "Time spent in one stage of the ingest path", ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+REQUEST_SECONDS = Histogram(
+    "recore_request_seconds", "HTTP request latency", ["endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+UPLOAD_ROWS = Histogram(
+    "recore_upload_rows", "GPU rows per /predict upload",
+    buckets=(10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000))
+ROWS = Counter("recore_rows_total", "GPU rows classified or written", ["stage"])
+UPLOAD_BYTES = Counter("recore_upload_bytes_total", "Request body bytes received by /predict", ["format"])
+ERRORS = Counter("recore_errors_total", "Requests that failed, by error type", ["endpoint", "type"])
+STARTUP_SECONDS = Gauge("recore_startup_seconds", "Seconds from process start to a startup milestone", ["phase"],
+                        multiprocess_mode="liveall")
+
+_timings = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def timed_iter(iterable, name):
+    """Yield from iterable, timing each step as stage `name` (e.g. parsing the next chunk)."""
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            item = next(iterator, StopIteration)
+        if item is StopIteration:
+            return
+        yield item
+
+
+def start_request():
+    """Collect stage timings of the current request; returns the dict they go to."""
+    timings = {}
+    _timings.set(timings)
+    return timings
+
+
+def mark_startup(phase):
+    """Record how long after this process started `phase` (import, models, first_response) was reached.
+
+    A gunicorn worker counts from its fork; with preload_app only the master
+    records "import" and "models".
+    """
+    seconds = time.time() - psutil.Process().create_time()
+    STARTUP_SECONDS.labels(phase).set(seconds)
+    log_event("startup", phase=phase, seconds=round(seconds, 3), pid=os.getpid())
+    return seconds
+
+
+def log_event(event, level=logging.INFO, exc_info=False, **fields):
+    # One JSON object per line so log pipelines can index batch_id, stages, etc.
+    logger.log(level, json.dumps({"event": event, **fields}, default=str), exc_info=exc_info)
+
+
+def render():
+    """Body and content type for GET /metrics."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class RequestProfiler:
+    """Optional pyinstrument sampling profile of one request (see PROFILE_HEADER in app.py).
+
+    The HTML report is written to `directory`; pyinstrument is only imported
+    when a request asks for a profile.
+    """
+
+    def __init__(self, directory, interval=0.001):
+        from pyinstrument import Profiler
+
+        self.directory = directory
+        self._profiler = Profiler(interval=interval, async_mode="disabled")
+        self._profiler.start()
+
+    def finish(self, name):
+        self._profiler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.html")
+        with open(path, "w") as f:
+            f.write(self._profiler.output_html())
+        return path
@@ -0,0 +1,205 @@
+"""Model artifacts loaded once per process, their versions, and micro-batched inference."""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import joblib
+import numpy as np
+
+from background import LazyQueue
+from ingest import build_label_lookup
+from metrics import stage
+
+# Retrained artifacts live in model_versions/<version>/ (see retrain.py);
+# model_versions/CURRENT names the one to serve. Without it the original
+# artifacts next to app.py are served as version "base".
+VERSIONS_DIR = "model_versions"
+BASE_VERSION = "base"
+ARTIFACTS = ["kmeans_model.joblib", "scaler.joblib", "label_mapping.joblib"]
+
+
+def current_version(base_dir="."):
+    """Return (version, model_dir) of the artifacts that should be served."""
+    pointer = os.path.join(base_dir, VERSIONS_DIR, "CURRENT")
+    if os.path.exists(pointer):
+        with open(pointer) as f:
+            version = f.read().strip()
+        if version and version != BASE_VERSION:
+            return version, os.path.join(base_dir, VERSIONS_DIR, version)
+    return BASE_VERSION, base_dir
+
+
+def set_current_version(version, base_dir="."):
+    # Write-then-rename so a polling worker never reads a half-written pointer
+    pointer = os.path.join(base_dir, VERSIONS_DIR, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+
+class ModelBundle:
+    """scaler + kmeans + label_mapping (+ optional anomaly model) used together.
+
+    The server attaches the `batcher` (MicroBatcher) and `parallel`
+    (ParallelClassifier) that classify with this version and no other. Requests
+    hold the bundle with acquire()/release(); once a newer version replaces it,
+    retire() stops them as soon as the last holder is done.
+    """
+
+    def __init__(self, kmeans, scaler, label_mapping, anomaly_model=None, version=BASE_VERSION):
+        self.version = version
+        self.kmeans = kmeans
+        self.scaler = scaler
+        self.label_mapping = label_mapping
+        self.label_lookup = build_label_lookup(label_mapping)
+        self.anomaly_model = anomaly_model
+        self.features = list(scaler.feature_names_in_)
+        self.batcher = None
+        self.parallel = None
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retired = False
+
+    @classmethod
+    def load(cls, model_dir=".", mmap_mode="r", version=BASE_VERSION):
+        # mmap_mode maps the NumPy arrays inside the pickles read-only from
+        # the page cache, so every process on the host shares one copy.
+        def load(name):
+            return joblib.load(os.path.join(model_dir, name), mmap_mode=mmap_mode)
+
+        anomaly_file = os.path.join(model_dir, "anomaly_model.joblib")
+        return cls(
+            load("kmeans_model.joblib"),
+            load("scaler.joblib"),
+            load("label_mapping.joblib"),
+            load("anomaly_model.joblib") if os.path.exists(anomaly_file) else None,
+            version,
+        )
+
+    def warm_up(self):
+        # The first transform/predict pays for sklearn's one-off setup (~30 ms);
+        # run it on one row before a request has to.
+        self.kmeans.predict(self.scaler.transform(np.zeros((1, len(self.features)))))
+        return self
+
+    def acquire(self):
+        # False once retired: the caller should take the current bundle instead.
+        with self._lock:
+            if self._retired:
+                return False
+            self._users += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            idle = self._retired and not self._users
+        if idle:
+            self._close()
+
+    def retire(self):
+        with self._lock:
+            self._retired = True
+            idle = not self._users
+        if idle:
+            self._close()
+
+    def _close(self):
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.parallel is not None:
+            self.parallel.shutdown()
+
+    def predict_classes(self, X):
+        with stage("scale"):
+            scaled = self.scaler.transform(X)
+        with stage("predict"):
+            clusters = self.kmeans.predict(scaled)
+        with stage("label"):
+            return self.label_lookup[clusters]
+
+
+class ModelLoader:
+    """Runs load() (e.g. ModelBundle.load + warm_up) on a background thread; get() waits for it.
+
+    A gunicorn worker forked while the master was still loading starts its
+    own load, since the loading thread only exists in the parent.
+    """
+
+    def __init__(self, load):
+        self.load = load
+        self._lock = threading.Lock()
+        self._pid = None
+        self._future = None
+
+    def start(self):
+        with self._lock:
+            if self._pid != os.getpid() and not (self._future is not None and self._future.done()):
+                self._pid = os.getpid()
+                self._future = Future()
+                threading.Thread(target=self._run, args=(self._future,), name="model-loader", daemon=True).start()
+        return self
+
+    def _run(self, future):
+        try:
+            future.set_result(self.load())
+        except BaseException as e:
+            future.set_exception(e)
+
+    def get(self):
+        return self.start()._future.result()
+
+
+class MicroBatcher:
+    """Merges concurrent small predict calls into one model call.
+
+    The first waiting request opens a window of `max_wait_ms`; everything that
+    arrives in that window (up to `max_rows` rows) is stacked, predicted in a
+    single call and split back to the callers in order.
+    """
+
+    def __init__(self, predict_fn, max_rows=1024, max_wait_ms=5):
+        self.predict_fn = predict_fn
+        self.max_rows = max_rows
+        self.max_wait = max_wait_ms / 1000
+        self._queue = LazyQueue(self._run, "micro-batcher")
+
+    def predict(self, X):
+        future = Future()
+        self._queue.put((X, future))
+        return future.result()
+
+    def close(self):
+        # Stops the thread; only call once no predict() can still be waiting.
+        self._queue.close()
+
+    def _run(self, requests):
+        while True:
+            pending = [requests.get()]
+            if pending[0] is None:
+                return
+            rows = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_rows:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                rows += len(item[0])
+
+            try:
+                result = self.predict_fn(np.concatenate([X for X, _ in pending]))
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            offset = 0
+            for X, future in pending:
+                future.set_result(result[offset:offset + len(X)])
+                offset += len(X)
@@ -0,0 +1,90 @@
+"""Classify very large uploads on a pool of worker processes.
+
+The feature matrix is copied once into shared memory; each worker attaches to
+it, runs scaler.transform + kmeans.predict on its own row range and writes the
+cluster ids into a shared output array, so no rows are pickled between
+processes and the result is already in row order.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+from model_server import ModelBundle
+
+_models = None
+
+
+def _init_worker(model_dir):
+    global _models
+    # One process per core already; stop sklearn's OpenMP threads from
+    # oversubscribing the machine on top of that.
+    threadpool_limits(1)
+    _models = ModelBundle.load(model_dir)
+
+
+def _predict_range(x_name, shape, dtype, out_name, start, stop):
+    x_shm = SharedMemory(name=x_name)
+    out_shm = SharedMemory(name=out_name)
+    try:
+        X = np.ndarray(shape, dtype=dtype, buffer=x_shm.buf)
+        out = np.ndarray(shape[0], dtype=np.int32, buffer=out_shm.buf)
+        out[start:stop] = _models.kmeans.predict(_models.scaler.transform(X[start:stop]))
+        # views must go before the buffers can be closed
+        del X, out
+    finally:
+        x_shm.close()
+        out_shm.close()
+
+
+class ParallelClassifier:
+    def __init__(self, workers, model_dir="."):
+        self.workers = workers
+        self.model_dir = os.path.abspath(model_dir)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # spawn, not fork: the Flask/gunicorn process already runs threads.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"),
+                                                     initializer=_init_worker, initargs=(self.model_dir,))
+                    # Set last, as in background.LazyQueue: concurrent uploads skip
+                    # the lock once they see this pid, so the pool must exist by then.
+                    self._pid = os.getpid()
+
+    def predict_clusters(self, X):
+        self._ensure_started()
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        x_shm = SharedMemory(create=True, size=max(X.nbytes, 1))
+        out_shm = SharedMemory(create=True, size=max(len(X) * 4, 1))
+        try:
+            shared = np.ndarray(X.shape, dtype=X.dtype, buffer=x_shm.buf)
+            shared[:] = X
+            bounds = np.linspace(0, len(X), self.workers + 1).astype(int)
+            futures = [
+                self._pool.submit(_predict_range, x_shm.name, X.shape, X.dtype.str, out_shm.name, start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+            ]
+            for future in futures:
+                future.result()
+            labels = np.ndarray(len(X), dtype=np.int32, buffer=out_shm.buf).copy()
+            del shared
+            return labels
+        finally:
+            x_shm.close()
+            x_shm.unlink()
+            out_shm.close()
+            out_shm.unlink()
+
+    def shutdown(self):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,214 @@
+"""Update the KMeans centroids from batches classified since the last version.
+
+Reads only finished batches that the version being updated (or one of its
+ancestors) has not been trained on, chunk by chunk, and applies the online (MacQueen) k-means update: every row moves its nearest
+centroid by 1/n towards it, with n carried over from the previous version's
+cluster sizes. The MinMaxScaler is widened with partial_fit on the same
+chunks, and centroids are re-expressed in the new scaled space whenever its
+range changes. Cluster ids keep their meaning, so label_mapping carries over.
+
+The scaler, model and label_mapping are saved together as a new version under
+model_versions/, and every batch used is tagged with it (trained_in on the
+job header), so a batch that finished late is still picked up next time. The
+new version is compared with the old one on a uniform
+sample of the new rows (inertia and silhouette, both measured in the new
+scaler's space). With --promote it becomes
+CURRENT, and running backends pick it up without a restart (MODEL_POLL_SEC,
+or POST /models/reload).
+
+Usage (from backend/):  python retrain.py [--promote] [--force] [--sample N]
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+from datetime import datetime
+
+import joblib
+import numpy as np
+from pymongo import MongoClient
+from sklearn.metrics import silhouette_score
+
+from columnar import decode_chunks
+from model_server import ARTIFACTS, VERSIONS_DIR, ModelBundle, current_version, set_current_version
+
+CHUNK_ROWS = 10000
+
+
+def lineage(base_dir, version, meta):
+    """version and every version it was retrained from, newest first."""
+    versions = []
+    while version is not None:
+        versions.append(version)
+        version = meta.get("parent")
+        meta = load_meta(os.path.join(base_dir, VERSIONS_DIR, version)) if version else {}
+    return versions
+
+
+def iter_new_batches(db, trained_versions):
+    # Not a high-water mark on _id: batch ids are upload times, and an earlier
+    # upload can finish after a later one was already trained on.
+    query = {"status": "done", "trained_in": {"$nin": trained_versions}}
+    yield from db["batch_jobs"].find(query, {"layout": 1}).sort("_id", 1)
+
+
+def iter_feature_chunks(db, header, features, chunk_rows=CHUNK_ROWS):
+    """Yield float feature matrices for one batch without loading it whole."""
+    batch_id = header["_id"]
+    if header.get("layout") == "columnar":
+        projection = {"batch_id": 1, "seq": 1, **{f"columns.{f}": 1 for f in features}}
+        for chunk in db["batch_chunks"].find({"batch_id": batch_id}, projection).sort("seq", 1):
+            yield decode_chunks([chunk], features)[features].to_numpy(dtype=np.float64)
+        return
+
+    projection = {"_id": 0, **{f: 1 for f in features}}
+    rows = []
+    for doc in db["classified_results"].find({"batch_id": batch_id}, projection).batch_size(chunk_rows):
+        rows.append([doc.get(f, np.nan) for f in features])
+        if len(rows) == chunk_rows:
+            yield np.array(rows, dtype=np.float64)
+            rows = []
+    if rows:
+        yield np.array(rows, dtype=np.float64)
+
+
+def evaluate(bundle, X, scaler):
+    # bundle's own scaler assigns the clusters, but the distances are measured
+    # in `scaler`'s space: partial_fit widens the new scaler, so inertia and
+    # silhouette from each model's own space are in different units.
+    labels = bundle.kmeans.predict(bundle.scaler.transform(X))
+    scaled = scaler.transform(X)
+    centers = scaler.transform(bundle.scaler.inverse_transform(bundle.kmeans.cluster_centers_))
+    inertia = float(((scaled - centers[labels]) ** 2).sum())
+    silhouette = float(silhouette_score(scaled, labels)) if len(np.unique(labels)) > 1 else None
+    return {"inertia": inertia, "silhouette": silhouette}
+
+
+def load_meta(model_dir):
+    path = os.path.join(model_dir, "meta.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def retrain(db, base_dir=".", sample_size=10000, seed=42):
+    version, model_dir = current_version(base_dir)
+    old = ModelBundle.load(model_dir, mmap_mode=None, version=version)
+    meta = load_meta(model_dir)
+    features = old.features
+
+    scaler = copy.deepcopy(old.scaler)
+    kmeans = copy.deepcopy(old.kmeans)
+    centers = kmeans.cluster_centers_.astype(np.float64).copy()
+    if "counts" in meta:
+        counts = np.array(meta["counts"], dtype=np.float64)
+    else:
+        # the base model still carries its training labels
+        counts = np.bincount(old.kmeans.labels_, minlength=len(centers)).astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    sample, sample_keys = np.empty((0, len(features))), np.empty(0)
+    new_rows = 0
+    batch_ids = []
+
+    for header in iter_new_batches(db, lineage(base_dir, version, meta)):
+        for X in iter_feature_chunks(db, header, features):
+            X = X[~np.isnan(X).any(axis=1)]
+            if not len(X):
+                continue
+            # Widen the scaler, then move the centroids into its new space
+            previous = copy.deepcopy(scaler)
+            scaler.partial_fit(X)
+            centers = scaler.transform(previous.inverse_transform(centers))
+
+            scaled = scaler.transform(X)
+            kmeans.cluster_centers_ = centers
+            labels = kmeans.predict(scaled)
+            for k in np.unique(labels):
+                members = scaled[labels == k]
+                counts[k] += len(members)
+                centers[k] += (members - centers[k]).sum(axis=0) / counts[k]
+
+            # bottom-k on random keys keeps a uniform sample of every row seen
+            keys = rng.random(len(X))
+            sample = np.vstack([sample, X])
+            sample_keys = np.concatenate([sample_keys, keys])
+            if len(sample) > sample_size:
+                keep = np.argpartition(sample_keys, sample_size)[:sample_size]
+                sample, sample_keys = sample[keep], sample_keys[keep]
+            new_rows += len(X)
+        batch_ids.append(header["_id"])
+
+    if new_rows == 0:
+        return None
+
+    kmeans.cluster_centers_ = centers
+    if hasattr(kmeans, "labels_"):
+        del kmeans.labels_  # training labels of the base fit, no longer meaningful
+    new = ModelBundle(kmeans, scaler, old.label_mapping, old.anomaly_model)
+
+    new_version = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    new_dir = os.path.join(base_dir, VERSIONS_DIR, new_version)
+    os.makedirs(new_dir)
+    joblib.dump(kmeans, os.path.join(new_dir, "kmeans_model.joblib"))
+    joblib.dump(scaler, os.path.join(new_dir, "scaler.joblib"))
+    joblib.dump(old.label_mapping, os.path.join(new_dir, "label_mapping.joblib"))
+    if os.path.exists(os.path.join(model_dir, "anomaly_model.joblib")):
+        shutil.copy(os.path.join(model_dir, "anomaly_model.joblib"), new_dir)
+
+    new_meta = {
+        "version": new_version,
+        "parent": version,
+        "created_at": datetime.utcnow().isoformat(),
+        "new_batches": len(batch_ids),
+        "new_rows": new_rows,
+        "counts": counts.tolist(),
+        "artifacts": ARTIFACTS,
+        "evaluation": {
+            "sample_rows": len(sample),
+            # both in the new version's scaled space
+            "old": evaluate(old, sample, scaler),
+            "new": evaluate(new, sample, scaler),
+        },
+    }
+    with open(os.path.join(new_dir, "meta.json"), "w") as f:
+        json.dump(new_meta, f, indent=2)
+    # Only descendants of new_version skip these; other versions still train on them
+    db["batch_jobs"].update_many({"_id": {"$in": batch_ids}}, {"$addToSet": {"trained_in": new_version}})
+    return new_meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--promote", action="store_true", help="make the new version CURRENT if it is not worse")
+    parser.add_argument("--force", action="store_true", help="promote even if the silhouette dropped")
+    parser.add_argument("--tolerance", type=float, default=0.02, help="allowed silhouette drop when promoting")
+    parser.add_argument("--sample", type=int, default=10000, help="rows sampled for inertia/silhouette")
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get("MONGO_URI", "mongodb://localhost:27017/recore_db"))
+    meta = retrain(client["processor_db"], sample_size=args.sample)
+    if meta is None:
+        print("No new batches since the current version.")
+        return
+
+    old, new = meta["evaluation"]["old"], meta["evaluation"]["new"]
+    print("Version:", meta["version"], "(parent:", meta["parent"] + ")")
+    print("New rows:", meta["new_rows"], "from", meta["new_batches"], "batches")
+    print(f"Inertia    old: {old['inertia']:.4f}  new: {new['inertia']:.4f}")
+    print(f"Silhouette old: {old['silhouette']}  new: {new['silhouette']}")
+
+    if args.promote:
+        worse = (old["silhouette"] is not None and new["silhouette"] is not None
+                 and new["silhouette"] < old["silhouette"] - args.tolerance)
+        if worse and not args.force:
+            print("Not promoted: silhouette dropped by more than", args.tolerance)
+        else:
+            set_current_version(meta["version"])
+            print("Promoted", meta["version"], "to CURRENT")
+
+
+if __name__ == "__main__":
+    main()
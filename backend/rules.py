@@ -0,0 +1,80 @@
+"""Maintenance, recycling and workload rules, evaluated over whole frames.
+
+Each rule is (label, conditions). A condition is (column, op, threshold) and
+a rule matches when all of its conditions hold. The threshold may name
+another column to compare against. Missing columns read as 0, the same as
+row.get(column, 0) did in the old per-row functions.
+"""
+import operator
+
+import numpy as np
+
+OPS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+
+# Every matching rule is reported, joined with ", " ("None" if nothing matches).
+MAINTENANCE_RULES = [
+    ("Clean fans, reapply thermal paste", [("thermal_score", ">", 18)]),
+    ("Lower power limit or increase cooling", [("avg_power_watts", ">", 180)]),
+    ("Reduce overclock or enforce power cap", [("avg_sm_pct", ">", 70), ("overclock_proxy", "==", 1)]),
+]
+
+# First matching rule wins; the last rule has no conditions and is the default.
+RECYCLING_RULES = [
+    ("✅ Can continue use", [("life_score", ">", 70)]),
+    ("⚠️ Consider partial recycling", [("life_score", ">", 40)]),
+    ("🔴 Recycle / Retire", []),
+]
+
+WORKLOAD_RULES = [
+    ("Compute-Intensive Workloads (AI/ML, HPC)", [("avg_sm_pct", ">", "avg_mem_pct")]),
+    ("Memory-Intensive Workloads (Rendering, Video Processing)", [("avg_mem_pct", ">", "avg_sm_pct")]),
+    ("Balanced Workloads", []),
+]
+
+
+def _values(df, column):
+    if column in df.columns:
+        return df[column].to_numpy()
+    return np.zeros(len(df))
+
+
+def condition_mask(df, conditions):
+    mask = np.ones(len(df), dtype=bool)
+    for column, op, threshold in conditions:
+        right = _values(df, threshold) if isinstance(threshold, str) else threshold
+        mask &= OPS[op](_values(df, column), right)
+    return mask
+
+
+def match_all(df, rules, separator=", ", default="None"):
+    # Encode which rules matched as a bitmask per row, then look the joined
+    # text up in a table with one entry per combination (2 ** len(rules)).
+    codes = np.zeros(len(df), dtype=np.int64)
+    for bit, (_, conditions) in enumerate(rules):
+        codes |= condition_mask(df, conditions).astype(np.int64) << bit
+    texts = np.empty(2 ** len(rules), dtype=object)
+    for code in range(len(texts)):
+        labels = [label for bit, (label, _) in enumerate(rules) if code >> bit & 1]
+        texts[code] = separator.join(labels) if labels else default
+    return texts[codes]
+
+
+def first_match(df, rules):
+    *ruled, (default, _) = rules
+    masks = [condition_mask(df, conditions) for _, conditions in ruled]
+    labels = np.array([label for label, _ in ruled] + [default], dtype=object)
+    # index of the first True mask, or len(ruled) for the default
+    choice = np.select(masks, np.arange(len(ruled)), default=len(ruled))
+    return labels[choice]
+
+
+def maintenance(df):
+    return match_all(df, MAINTENANCE_RULES)
+
+
+def recycling(df):
+    return first_match(df, RECYCLING_RULES)
+
+
+def workload(df):
+    return first_match(df, WORKLOAD_RULES)
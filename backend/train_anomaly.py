@@ -0,0 +1,35 @@
+"""Train the IsolationForest used to flag anomalous GPUs.
+
+Fitted once offline on the same cleaned feature file as the KMeans model;
+the backend and dashboard only ever score with it.
+
+Usage (from backend/):  python train_anomaly.py [path/to/cleaned_features.csv]
+"""
+import sys
+from pathlib import Path
+
+import joblib
+import pandas as pd
+
+from enrich import ANOMALY_FEATURES, new_anomaly_model
+
+CLEANED_FILE = Path("data") / "processed" / "cleaned_features.csv"
+MODEL_FILE = Path("anomaly_model.joblib")
+
+
+def main(cleaned_file=CLEANED_FILE):
+    df = pd.read_csv(cleaned_file)
+    features = df[ANOMALY_FEATURES]
+    print("Shape:", features.shape)
+
+    iso = new_anomaly_model().fit(features)
+    labels = iso.predict(features)
+    print("Anomalies in training data:", int((labels == -1).sum()))
+    print("Score threshold (offset_):", round(float(iso.offset_), 4))
+
+    joblib.dump(iso, MODEL_FILE)
+    print("Saved anomaly model to", MODEL_FILE)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else CLEANED_FILE)
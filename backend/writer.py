@@ -0,0 +1,203 @@
+import logging
+from datetime import datetime
+from itertools import islice
+
+from pymongo.errors import BulkWriteError
+
+from background import LazyQueue
+from columnar import CHUNK_ROWS, encode_chunks
+from ingest import iter_documents
+from metrics import ROWS, log_event, stage
+
+# Queue marker: the upload failed, remove what was written of it
+_DROP = "drop"
+
+
+class BatchWriter:
+    """Persists classified frames to MongoDB, optionally on a background thread.
+
+    /predict hands every classified frame (or chunk) to submit() and calls
+    finish() once the whole upload is classified. Rows are written with
+    unordered insert_many calls of `batch_rows` documents, and the progress of
+    each batch_id is kept in the `jobs` collection so any worker can answer
+    /jobs/<batch_id>.
+
+    With background=False the same writes happen inline in the request.
+
+    layout="rows" stores one document per GPU row in `collection`;
+    layout="columnar" stores column-packed chunks (see columnar.py) in
+    `chunks`, and the job document doubles as the batch header.
+
+    With a `history` (history.GpuHistory), every written frame is also added
+    to the per-GPU history, timestamped with the batch's start time.
+
+    A failed batch keeps nothing: frames of it still queued are skipped and
+    its rows, chunks and history points are deleted, so a retry of the same
+    upload starts clean.
+    """
+
+    def __init__(self, collection, jobs, chunks=None, batch_rows=5000, background=True, max_pending=4,
+                 layout="rows", chunk_rows=CHUNK_ROWS, history=None):
+        self.collection = collection
+        self.jobs = jobs
+        self.chunks = chunks
+        self.batch_rows = batch_rows
+        self.background = background
+        self.layout = layout
+        self.chunk_rows = chunk_rows
+        self.history = history
+        # rows already handed to _write per batch, used as the chunk seq
+        self._offsets = {}
+        # start time per batch_id, the timestamp of its history points
+        self._started = {}
+        # batches that failed and are not cleaned up yet
+        self._failed = set()
+        self.max_pending = max_pending
+        # Bounded so a slow database pushes back on /predict instead of
+        # letting classified chunks pile up in memory.
+        self._queue = LazyQueue(self._run, "batch-writer", maxsize=max_pending)
+
+    def ensure_indexes(self):
+        if self.layout == "columnar":
+            self.chunks.create_index([("batch_id", 1), ("seq", 1)])
+
+    def start_job(self, batch_id, **fields):
+        # fields are stored on the job header as well (e.g. the upload's content hash)
+        started = self._started[batch_id] = datetime.utcnow()
+        self.jobs.insert_one({
+            "_id": batch_id,
+            "status": "classifying",
+            "total_records": None,
+            "persisted": 0,
+            "summary": None,
+            "layout": self.layout,
+            "error": None,
+            "created_at": started.isoformat(),
+            # progress heartbeat, see dedupe.stalled
+            "updated_at": started.isoformat(),
+            **fields,
+        })
+
+    def discard(self, batch_id):
+        # Drop the header of a batch that was started but never written (a duplicate upload)
+        self._started.pop(batch_id, None)
+        self.jobs.delete_one({"_id": batch_id})
+
+    def submit(self, batch_id, df):
+        if self.background:
+            self._queue.put((batch_id, df))
+        else:
+            self._write(batch_id, df)
+
+    def finish(self, batch_id, total_records, summary=None):
+        # A batch the writer thread already failed stays failed
+        self.jobs.update_one({"_id": batch_id, "status": {"$ne": "failed"}},
+                             {"$set": {"total_records": total_records, "status": "writing", "summary": summary,
+                                       "updated_at": datetime.utcnow().isoformat()}})
+        if self.background:
+            self._queue.put((batch_id, None))
+        else:
+            self._complete(batch_id)
+
+    def fail(self, batch_id, error):
+        # Called by /predict when the upload cannot be finished; the cleanup runs
+        # on the writer thread after the frames already queued for the batch.
+        self._mark_failed(batch_id, error)
+        if self.background:
+            self._queue.put((batch_id, _DROP))
+        else:
+            self._drop(batch_id)
+
+    def purge(self, batch_id):
+        """Delete everything stored for batch_id except its job header."""
+        self.collection.delete_many({"batch_id": batch_id})
+        if self.chunks is not None:
+            self.chunks.delete_many({"batch_id": batch_id})
+        if self.history is not None:
+            self.history.forget(batch_id)
+        self.jobs.update_one({"_id": batch_id}, {"$set": {"persisted": 0}})
+
+    def _mark_failed(self, batch_id, error):
+        self._failed.add(batch_id)
+        self.jobs.update_one({"_id": batch_id}, {"$set": {"status": "failed", "error": str(error)}})
+        log_event("batch_failed", logging.ERROR, batch_id=batch_id, error=str(error))
+
+    def _drop(self, batch_id):
+        self._failed.discard(batch_id)
+        self._offsets.pop(batch_id, None)
+        self._started.pop(batch_id, None)
+        self.purge(batch_id)
+        self.jobs.update_one({"_id": batch_id}, {"$set": {"status": "failed"}})
+
+    def status(self, batch_id):
+        job = self.jobs.find_one({"_id": batch_id})
+        if job is not None:
+            job["batch_id"] = job.pop("_id")
+        return job
+
+    def wait(self):
+        # Block until everything submitted so far has been written.
+        self._queue.join()
+
+    def _run(self, pending):
+        while True:
+            batch_id, df = pending.get()
+            try:
+                if df is _DROP:
+                    self._drop(batch_id)
+                elif df is None:
+                    self._complete(batch_id)
+                else:
+                    self._write(batch_id, df)
+            except Exception as e:
+                # the upload's finish() or fail() marker is still to come and cleans up
+                self._mark_failed(batch_id, e)
+            finally:
+                pending.task_done()
+
+    def _write(self, batch_id, df):
+        if batch_id in self._failed:
+            return
+        if self.layout == "columnar":
+            start_row = self._offsets.get(batch_id, 0)
+            self._offsets[batch_id] = start_row + len(df)
+            self._insert(batch_id, self.chunks, encode_chunks(df, batch_id, start_row, self.chunk_rows),
+                         self.batch_rows // self.chunk_rows or 1, weight=lambda doc: doc["rows"], build="encode")
+        else:
+            self._insert(batch_id, self.collection, iter_documents(df), self.batch_rows)
+        if self.history is not None and batch_id not in self._failed:
+            with stage("history"):
+                self.history.record(batch_id, self._started.get(batch_id) or datetime.utcnow(), df)
+
+    def _insert(self, batch_id, target, documents, batch_size, weight=None, build="documents"):
+        # weight(doc) is how many GPU rows a document carries (1 in the row layout);
+        # build names the stage that turns the frame into documents
+        while True:
+            with stage(build):
+                batch = list(islice(documents, batch_size))
+            if not batch:
+                return
+            try:
+                with stage("insert"):
+                    target.insert_many(batch, ordered=False)
+                inserted = batch
+            except BulkWriteError as e:
+                failed = {err["index"] for err in e.details.get("writeErrors", [])}
+                inserted = [doc for i, doc in enumerate(batch) if i not in failed]
+                self._mark_failed(batch_id, e.details.get("writeErrors", [{}])[0].get("errmsg", e))
+            rows = sum(map(weight, inserted)) if weight else len(inserted)
+            ROWS.labels("insert").inc(rows)
+            self.jobs.update_one({"_id": batch_id}, {"$inc": {"persisted": rows},
+                                                     "$set": {"updated_at": datetime.utcnow().isoformat()}})
+            if batch_id in self._failed:
+                return
+
+    def _complete(self, batch_id):
+        if batch_id in self._failed:
+            self._drop(batch_id)
+            return
+        self._offsets.pop(batch_id, None)
+        started = self._started.pop(batch_id, None)
+        self.jobs.update_one({"_id": batch_id, "status": {"$ne": "failed"}}, {"$set": {"status": "done"}})
+        log_event("batch_written", batch_id=batch_id, layout=self.layout,
+                  seconds=round((datetime.utcnow() - started).total_seconds(), 4) if started else None)
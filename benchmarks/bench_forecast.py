@@ -0,0 +1,59 @@
+"""Remaining-useful-life fit: one np.polyfit per GPU vs forecast.py's fleet-wide fit.
+
+Both start from the same history points in memory, so this measures the
+fitting alone (in the app the per-GPU sums come from a MongoDB $group).
+Run from the repo root:  python benchmarks/bench_forecast.py [gpus ...]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from forecast import RETIRE_LIFE_SCORE, forecast, points_stats  # noqa: E402
+
+BATCHES = int(os.getenv("BATCHES", "20"))
+LOOP_GPUS = 5_000  # the per-GPU loop is timed on this many and scaled up
+
+
+def make_history(gpus, batches=BATCHES, seed=0):
+    rng = np.random.default_rng(seed)
+    slope = rng.uniform(-1.0, 0.2, gpus)
+    t = np.tile(-np.arange(batches)[::-1] * 7.0, gpus)  # weekly uploads, t in days
+    gpu_id = np.repeat(np.arange(gpus), batches)
+    life = np.clip(90 + np.repeat(slope, batches) * (t - t.min()) + rng.normal(0, 2, len(t)), 0, 100)
+    return gpu_id, t, life
+
+
+def polyfit_loop(gpu_id, t, life, gpus):
+    days = np.empty(gpus)
+    for g in range(gpus):
+        mask = gpu_id == g
+        slope, intercept = np.polyfit(t[mask], life[mask], 1)
+        now = intercept
+        days[g] = 0.0 if now <= RETIRE_LIFE_SCORE else (now - RETIRE_LIFE_SCORE) / -slope if slope < 0 else np.inf
+    return days
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'gpus':>8} {'points':>10} {'loop (s, est.)':>15} {'fleet (s)':>10} {'speedup':>8}")
+    for gpus in sizes:
+        gpu_id, t, life = make_history(gpus)
+        current = pd.DataFrame({"GPU_ID": np.arange(gpus), "life_score": life.reshape(gpus, -1)[:, -1]})
+
+        start = time.perf_counter()
+        result = forecast(current, points_stats(gpu_id, t, life), datetime.utcnow())
+        t_fleet = time.perf_counter() - start
+
+        n = min(gpus, LOOP_GPUS)
+        mask = gpu_id < n
+        start = time.perf_counter()
+        polyfit_loop(gpu_id[mask], t[mask], life[mask], n)
+        t_loop = (time.perf_counter() - start) * gpus / n
+
+        assert len(result) == gpus
+        print(f"{gpus:>8} {len(t):>10} {t_loop:>15.2f} {t_fleet:>10.3f} {t_loop / t_fleet:>7.0f}x")
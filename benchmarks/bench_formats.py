@@ -0,0 +1,74 @@
+"""End-to-end /predict latency for CSV, Parquet, Arrow IPC and Feather uploads.
+
+Posts the same synthetic fleet in each format to the Flask app (in-process,
+mongomock storage, enrichment off) and times the request. Writes happen on
+the background writer and are drained outside the timed section.
+
+Requires mongomock and pyarrow.
+Run from the repo root:  python benchmarks/bench_formats.py [rows ...]
+"""
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+FEATURES = ["overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+            "avg_sm_pct", "avg_mem_pct", "thermal_score"]
+
+
+def make_fleet(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "overclock_proxy": rng.integers(0, 2, rows),
+        "usage_hours": rng.uniform(0, 5000, rows),
+        "avg_power_watts": rng.uniform(50, 300, rows),
+        "peak_power_watts": rng.uniform(100, 400, rows),
+        "avg_sm_pct": rng.uniform(0, 100, rows),
+        "avg_mem_pct": rng.uniform(0, 100, rows),
+        "thermal_score": rng.uniform(0, 30, rows),
+    })
+    return df[FEATURES]
+
+
+def encode(df, fmt):
+    buffer = io.BytesIO()
+    if fmt == "csv":
+        df.to_csv(buffer, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(buffer, index=False)
+    elif fmt == "arrow":
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_file(buffer, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "feather":
+        feather.write_feather(df, buffer)
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    os.environ.setdefault("MONGO_URI", "mongomock://localhost")
+    os.environ.setdefault("ENRICH_INGEST", "0")
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend  # noqa: E402
+
+    client = backend.app.test_client()
+    print(f"{'rows':>9} {'format':>8} {'MB':>7} {'latency (s)':>12}")
+    for rows in sizes:
+        df = make_fleet(rows)
+        for fmt in ("csv", "parquet", "arrow", "feather"):
+            payload = encode(df, fmt)
+            start = time.perf_counter()
+            response = client.post("/predict", data={"file": (io.BytesIO(payload), f"fleet.{fmt}")},
+                                   content_type="multipart/form-data")
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.get_json()
+            backend.writer.wait()
+            print(f"{rows:>9} {fmt:>8} {len(payload) / 1e6:>7.2f} {elapsed:>12.3f}")
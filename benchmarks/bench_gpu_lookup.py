@@ -0,0 +1,44 @@
+"""GPU Comparison lookups: a boolean scan per GPU vs data.gpu_positions().
+
+The index is built once per batch (the dashboard caches it); every lookup
+after that is a hash probe. Run from the repo root:
+
+    python benchmarks/bench_gpu_lookup.py [gpus ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard"))
+from data import gpu_positions  # noqa: E402
+
+LOOKUPS = 200  # e.g. reruns while someone flips through GPUs
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'gpus':>10} {'scan/lookup (ms)':>17} {'index build (ms)':>17} {'lookup (ms)':>12} {'speedup':>8}")
+    rng = np.random.default_rng(0)
+    for gpus in sizes:
+        df = pd.DataFrame({"GPU_ID": rng.permutation(gpus), "life_score": rng.uniform(0, 100, gpus)})
+        wanted = rng.choice(df["GPU_ID"].to_numpy(), LOOKUPS).tolist()
+
+        start = time.perf_counter()
+        scanned = [df[df["GPU_ID"] == g].iloc[0] for g in wanted]
+        t_scan = (time.perf_counter() - start) / LOOKUPS
+
+        start = time.perf_counter()
+        positions = gpu_positions(df)
+        positions.get(wanted[0])  # the hash table is built on first use
+        t_build = time.perf_counter() - start
+        start = time.perf_counter()
+        indexed = [df.iloc[positions[g]] for g in wanted]
+        t_lookup = (time.perf_counter() - start) / LOOKUPS
+
+        assert all(a.equals(b) for a, b in zip(scanned, indexed))
+        print(f"{gpus:>10} {t_scan * 1000:>17.3f} {t_build * 1000:>17.1f} {t_lookup * 1000:>12.3f} "
+              f"{t_scan / t_lookup:>7.0f}x")
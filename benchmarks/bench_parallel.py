@@ -0,0 +1,56 @@
+"""Serial vs process-pool classification (backend/parallel.py).
+
+Checks that every worker count gives exactly the serial cluster ids and
+reports the speedup over a single-threaded serial run.
+
+Run from the repo root:  python benchmarks/bench_parallel.py [rows] [max_workers]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+from model_server import ModelBundle  # noqa: E402
+from parallel import ParallelClassifier  # noqa: E402
+
+
+def make_features(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(0, 2, rows),
+        rng.uniform(0, 5000, rows),
+        rng.uniform(50, 300, rows),
+        rng.uniform(100, 400, rows),
+        rng.uniform(0, 100, rows),
+        rng.uniform(0, 100, rows),
+        rng.uniform(0, 30, rows),
+    ]).astype(np.float64)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    X = make_features(rows)
+    models = ModelBundle.load(BACKEND_DIR)
+
+    with threadpool_limits(1):
+        start = time.perf_counter()
+        expected = models.kmeans.predict(models.scaler.transform(X))
+        t_serial = time.perf_counter() - start
+    print(f"{rows} rows, serial (1 thread): {t_serial:.3f}s")
+    print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8} {'identical':>10}")
+
+    workers = 1
+    while workers <= max_workers:
+        pool = ParallelClassifier(workers, BACKEND_DIR)
+        pool.predict_clusters(X[:1000])  # start the workers and load the models
+        start = time.perf_counter()
+        got = pool.predict_clusters(X)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+        print(f"{workers:>8} {elapsed:>9.3f} {t_serial / elapsed:>7.2f}x {str((got == expected).all()):>10}")
+        workers *= 2
@@ -0,0 +1,72 @@
+"""Scatter plot payload: every GPU vs the dashboard's level-of-detail sample.
+
+Reports the Plotly JSON sent to the browser and the time to build and
+serialise each figure. Run from the repo root:
+
+    python benchmarks/bench_plot_lod.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard"))
+from data import lod_sample  # noqa: E402
+
+MAX_POINTS = int(os.getenv("PLOT_MAX_POINTS", "5000"))
+# The dashboard's anomaly rate: the IsolationForest's contamination
+ANOMALY_RATE = 0.1
+CLASSES = ["CLUSTER_1_lt_5_years", "CLUSTER_2_5_8_years", "CLUSTER_3_8_10_years"]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "GPU_ID": np.arange(1, rows + 1),
+        "health_class": rng.choice(CLASSES, rows, p=[0.57, 0.28, 0.15]),
+        "life_score": rng.uniform(0, 100, rows),
+        "avg_power_watts": rng.uniform(50, 300, rows),
+        "avg_sm_pct": rng.uniform(0, 100, rows),
+        "avg_mem_pct": rng.uniform(0, 100, rows),
+        "thermal_score": rng.uniform(0, 30, rows),
+        "Anomaly_Label": np.where(rng.random(rows) < ANOMALY_RATE, "Anomaly", "Normal"),
+    })
+
+
+# The three plots the dashboard downsamples; only the anomaly scatter keeps anomalies first
+PLOTS = {
+    "cluster": (False, lambda d: px.scatter(d, x="avg_power_watts", y="thermal_score", color="health_class",
+                                            hover_data=["GPU_ID", "life_score"])),
+    "anomaly": (True, lambda d: px.scatter(d, x="avg_power_watts", y="avg_sm_pct", color="Anomaly_Label")),
+    "3d": (False, lambda d: px.scatter_3d(d, x="avg_power_watts", y="avg_sm_pct", z="avg_mem_pct",
+                                          color="health_class")),
+}
+
+
+def payload(plot, frame):
+    start = time.perf_counter()
+    size = len(plot(frame).to_json())
+    return size / 1e6, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'rows':>9} {'plot':>8} {'points':>8} {'full MB':>8} {'full s':>7} {'lod MB':>7} {'lod s':>6}")
+    for rows in sizes:
+        df = make_frame(rows)
+        anomalies = df["Anomaly_Label"] == "Anomaly"
+        start = time.perf_counter()
+        samples = {False: lod_sample(df, MAX_POINTS), True: lod_sample(df, MAX_POINTS, keep=anomalies)}
+        t_sample = time.perf_counter() - start
+        kept = (samples[True]["Anomaly_Label"] == "Anomaly").sum()
+        assert kept == min(anomalies.sum(), MAX_POINTS // 2)
+        for name, (keep, plot) in PLOTS.items():
+            sample = samples[keep]
+            full_mb, full_s = payload(plot, df)
+            lod_mb, lod_s = payload(plot, sample)
+            print(f"{rows:>9} {name:>8} {len(sample):>8} {full_mb:>8.2f} {full_s:>7.2f} {lod_mb:>7.2f} {lod_s:>6.2f}")
+        print(f"{'':>9} sampling took {t_sample * 1000:.1f} ms")
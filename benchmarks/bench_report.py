@@ -0,0 +1,62 @@
+"""Full lifecycle PDF: the old iterrows/drawString loop vs dashboard/report.py.
+
+Run from the repo root:  python benchmarks/bench_report.py [rows ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "dashboard"))
+from report import write_fleet_report  # noqa: E402
+
+SUMMARY = {"avg_life": 50.0, "most_common": "CLUSTER_2_5_8_years", "high_risk": 0}
+
+
+# The GPU Summary loop the dashboard used before the report service.
+def iterrows_report(path, df):
+    c = canvas.Canvas(path, pagesize=letter)
+    height = letter[1]
+    y = height - 50
+    for _, row in df.iterrows():
+        c.drawString(50, y, f"GPU_ID: {row.get('GPU_ID', 'N/A')} | Class: {row.get('health_class')} | "
+                            f"Life Score: {row.get('life_score', 0.0):.1f}")
+        y -= 14
+        if y < 100:
+            c.showPage()
+            y = height - 50
+    c.save()
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "GPU_ID": np.arange(1, rows + 1),
+        "health_class": rng.choice(["CLUSTER_1_lt_5_years", "CLUSTER_2_5_8_years", "CLUSTER_3_8_10_years"], rows),
+        "life_score": rng.uniform(0, 100, rows),
+        "Anomaly_Label": np.where(rng.random(rows) < 0.05, "Anomaly", "Normal"),
+        "Anomaly_Score": rng.normal(size=rows),
+    })
+
+
+def timed(fn, path):
+    start = time.perf_counter()
+    fn(path)
+    return time.perf_counter() - start, os.path.getsize(path) / 1e6
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    print(f"{'rows':>10} {'iterrows (s)':>13} {'blocks (s)':>11} {'speedup':>8} {'pdf (MB)':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.pdf")
+        for rows in sizes:
+            df = make_frame(rows)
+            t_old, _ = timed(lambda p: iterrows_report(p, df), path)
+            t_new, size = timed(lambda p: write_fleet_report(p, df, SUMMARY), path)
+            print(f"{rows:>10} {t_old:>13.2f} {t_new:>11.2f} {t_old / t_new:>7.1f}x {size:>9.1f}")
@@ -0,0 +1,70 @@
+"""Maintenance/recycling/workload rules: df.apply(axis=1) vs backend/rules.py.
+
+Run from the repo root:  python benchmarks/bench_rules.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from rules import maintenance, recycling, workload  # noqa: E402
+
+
+# The row-wise functions the dashboard used before the rule table.
+def get_recommendations(row):
+    recs = []
+    if row.get("thermal_score", 0) > 18: recs.append("Clean fans, reapply thermal paste")
+    if row.get("avg_power_watts", 0) > 180: recs.append("Lower power limit or increase cooling")
+    if row.get("avg_sm_pct", 0) > 70 and row.get("overclock_proxy", 0) == 1: recs.append("Reduce overclock or enforce power cap")
+    return ", ".join(recs) if recs else "None"
+
+
+def recycling_category(row):
+    if row.get("life_score", 0) > 70: return "✅ Can continue use"
+    elif row.get("life_score", 0) > 40: return "⚠️ Consider partial recycling"
+    else: return "🔴 Recycle / Retire"
+
+
+def workload_recommendation(row):
+    if row.get("avg_sm_pct", 0) > row.get("avg_mem_pct", 0): return "Compute-Intensive Workloads (AI/ML, HPC)"
+    elif row.get("avg_mem_pct", 0) > row.get("avg_sm_pct", 0): return "Memory-Intensive Workloads (Rendering, Video Processing)"
+    else: return "Balanced Workloads"
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "overclock_proxy": rng.integers(0, 2, rows),
+        "avg_power_watts": rng.uniform(50, 300, rows),
+        "avg_sm_pct": rng.integers(0, 101, rows).astype(float),
+        "avg_mem_pct": rng.integers(0, 101, rows).astype(float),
+        "thermal_score": rng.uniform(0, 30, rows),
+    })
+    df["life_score"] = (100 - (df["thermal_score"] + df["avg_sm_pct"] / 2)).clip(0, 100)
+    return df
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    pairs = [
+        ("maintenance", get_recommendations, maintenance),
+        ("recycling", recycling_category, recycling),
+        ("workload", workload_recommendation, workload),
+    ]
+    print(f"{'rows':>10} {'rule set':>12} {'apply (s)':>10} {'vector (s)':>11} {'speedup':>9}")
+    for rows in sizes:
+        df = make_frame(rows)
+        for name, row_fn, vector_fn in pairs:
+            t_apply, expected = timed(lambda: df.apply(row_fn, axis=1))
+            t_vec, got = timed(lambda: vector_fn(df))
+            assert (expected.to_numpy() == got).all(), name
+            print(f"{rows:>10} {name:>12} {t_apply:>10.3f} {t_vec:>11.4f} {t_apply / t_vec:>8.0f}x")
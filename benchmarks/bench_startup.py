@@ -0,0 +1,82 @@
+"""Cold start of the backend (eager vs LAZY_STARTUP=1) and the dashboard's imports.
+
+Every measurement runs in a fresh interpreter. For the backend it reports
+seconds from interpreter start until app.py is imported, until GET / answers
+and until the first POST /predict/json (which needs the models) answers,
+using Flask's test client and an in-memory mongomock database. For the
+dashboard it reports the import time of the modules app.py imports.
+
+Run from the repo root:  python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(HERE, "..", "backend")
+DASHBOARD_DIR = os.path.join(HERE, "..", "dashboard")
+
+BACKEND = """
+import json, time, warnings
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get("/")
+home = time.perf_counter()
+client.post("/predict/json", json={f: 1.0 for f in %r})
+predict = time.perf_counter()
+print(json.dumps({"import": imported - start, "first GET /": home - start, "first /predict/json": predict - start}))
+"""
+
+DASHBOARD = """
+import json, sys, time
+start = time.perf_counter()
+import pandas, numpy, plotly.express, plotly.graph_objects, pymongo
+sys.path.insert(0, %r)
+from aggregates import batch_aggregates
+from data import derive, latest_batch, load_batch, lod_sample
+from forecast import RETIRE_LIFE_SCORE, fleet_forecast
+from history import GpuHistory
+from report import ReportService
+print(json.dumps({"import": time.perf_counter() - start, "sklearn": "sklearn" in sys.modules,
+                  "reportlab": "reportlab" in sys.modules}))
+"""
+
+FEATURES = ["overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+            "avg_sm_pct", "avg_mem_pct", "thermal_score"]
+
+
+def run(code, cwd, env=None):
+    out = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True,
+                         env={**os.environ, **(env or {})}, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def median_of(results):
+    return {k: statistics.median(r[k] for r in results) for k in results[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    env = {"MONGO_URI": "mongomock://localhost", "LOG_LEVEL": "WARNING"}
+    print(f"backend (median of {args.runs} runs, seconds since interpreter start)")
+    for mode, lazy in (("eager", "0"), ("LAZY_STARTUP=1", "1")):
+        times = median_of([run(BACKEND % FEATURES, BACKEND_DIR, {**env, "LAZY_STARTUP": lazy})
+                           for _ in range(args.runs)])
+        print(f"  {mode:>15}  " + "  ".join(f"{k} {v:.3f}s" for k, v in times.items()))
+
+    results = [run(DASHBOARD % os.path.abspath(BACKEND_DIR), DASHBOARD_DIR) for _ in range(args.runs)]
+    print(f"dashboard imports {statistics.median(r['import'] for r in results):.3f}s "
+          f"(sklearn imported: {results[0]['sklearn']}, reportlab imported: {results[0]['reportlab']})")
+
+
+if __name__ == "__main__":
+    main()
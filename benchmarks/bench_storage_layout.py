@@ -0,0 +1,40 @@
+"""Row-per-GPU documents vs column-packed chunks: stored bytes and decode time.
+
+Run from the repo root:  python benchmarks/bench_storage_layout.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import bson
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from bench_write_path import LABEL_MAPPING, make_frame  # noqa: E402
+from columnar import decode_chunks, encode_chunks  # noqa: E402
+from ingest import build_label_lookup, iter_documents  # noqa: E402
+
+BATCH_ID = "2025-01-01T00:00:00.000000"
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    lookup = build_label_lookup(LABEL_MAPPING)
+    print(f"{'rows':>10} {'layout':>9} {'docs':>7} {'MB':>8} {'decode (s)':>11}")
+    for rows in sizes:
+        df, cluster_labels = make_frame(rows)
+        df["Predicted_Class"] = lookup[cluster_labels]
+        df["batch_id"] = BATCH_ID
+
+        row_docs = [bson.encode(doc) for doc in iter_documents(df)]
+        start = time.perf_counter()
+        pd.DataFrame([bson.decode(doc) for doc in row_docs])
+        t_rows = time.perf_counter() - start
+
+        chunk_docs = [bson.encode(doc) for doc in encode_chunks(df, BATCH_ID)]
+        start = time.perf_counter()
+        decode_chunks(bson.decode(doc) for doc in chunk_docs)
+        t_cols = time.perf_counter() - start
+
+        for layout, docs, elapsed in (("rows", row_docs, t_rows), ("columnar", chunk_docs, t_cols)):
+            mb = sum(map(len, docs)) / 1e6
+            print(f"{rows:>10} {layout:>9} {len(docs):>7} {mb:>8.2f} {elapsed:>11.3f}")
@@ -0,0 +1,59 @@
+"""Label lookup + document building: old row-wise path vs the columnar one.
+
+Run from the repo root:  python benchmarks/bench_write_path.py [rows ...]
+"""
+import os
+import sys
+import time
+
+import bson
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+from ingest import build_label_lookup, iter_documents  # noqa: E402
+
+LABEL_MAPPING = {0: "CLUSTER_3_8_10_years", 1: "CLUSTER_2_5_8_years", 2: "CLUSTER_1_lt_5_years"}
+COLUMNS = ["overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+           "avg_sm_pct", "avg_mem_pct", "thermal_score"]
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((rows, len(COLUMNS))) * 100, columns=COLUMNS)
+    return df, rng.integers(0, 3, rows)
+
+
+def old_path(df, cluster_labels):
+    df = df.copy()
+    df["Predicted_Class"] = [LABEL_MAPPING[label] for label in cluster_labels]
+    df["batch_id"] = "bench"
+    return [bson.encode(doc) for doc in df.to_dict(orient="records")]
+
+
+def new_path(df, cluster_labels, lookup):
+    df = df.copy()
+    df["Predicted_Class"] = lookup[cluster_labels]
+    df["batch_id"] = "bench"
+    return [bson.encode(doc) for doc in iter_documents(df)]
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000]
+    lookup = build_label_lookup(LABEL_MAPPING)
+    print(f"{'rows':>10} {'old (s)':>10} {'new (s)':>10} {'speedup':>8}")
+    for rows in sizes:
+        df, cluster_labels = make_frame(rows)
+        assert old_path(df, cluster_labels) == new_path(df, cluster_labels, lookup)
+        t_old = best_of(lambda: old_path(df, cluster_labels))
+        t_new = best_of(lambda: new_path(df, cluster_labels, lookup))
+        print(f"{rows:>10} {t_old:>10.3f} {t_new:>10.3f} {t_old / t_new:>7.2f}x")
@@ -0,0 +1,216 @@
+"""Stage-by-stage timings of the /predict ingest path and the dashboard data path.
+
+For each fleet size a synthetic upload (see synthetic.py) goes through the
+same functions the backend and dashboard call:
+
+    ingest:     parse, scale, predict, label, enrich, insert
+    dashboard:  load, derive, anomaly, aggregate
+
+Inserts go to an in-memory mongomock database unless --mongo-uri points at
+a real server (the "processor_bench" database is dropped afterwards). Sizes
+above --mongo-max-rows skip insert and load and run the dashboard stages on
+the in-memory frame.
+
+Run from the repo root:
+
+    python benchmarks/harness.py --rows 1000 10000 100000 [--output results.json]
+    python benchmarks/harness.py --baseline old.json   # fail on slowdowns
+
+Results are written as JSON (one record per size and stage, plus versions
+and the git commit) to benchmarks/results/ by default.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "backend"))
+sys.path.insert(0, os.path.join(HERE, "..", "dashboard"))
+from aggregates import batch_aggregates  # noqa: E402
+from data import derive, load_batch  # noqa: E402
+from enrich import BatchSummary, detect_anomalies, enrich  # noqa: E402
+from ingest import iter_upload  # noqa: E402
+from model_server import ModelBundle  # noqa: E402
+from writer import BatchWriter  # noqa: E402
+
+from synthetic import write_fleet  # noqa: E402
+
+# Enrichment columns the backend stores; dropped before "derive" so it does the full work
+DERIVED = ["life_score", "Maintenance", "Recycling", "Workload", "Anomaly", "Anomaly_Score"]
+
+
+class Timer:
+    def __init__(self, rows, path, results):
+        self.rows, self.path, self.results = rows, path, results
+
+    def __call__(self, stage, fn, note=None):
+        start = time.perf_counter()
+        out = fn()
+        seconds = time.perf_counter() - start
+        record = {"rows": self.rows, "path": self.path, "stage": stage, "seconds": round(seconds, 6),
+                  "rows_per_sec": round(self.rows / seconds) if seconds > 0 else None}
+        if note:
+            record["note"] = note
+        self.results.append(record)
+        print(f"{self.rows:>10} {self.path:>10} {stage:>10} {seconds:>10.4f}s {record['rows_per_sec'] or 0:>12,} rows/s"
+              + (f"  ({note})" if note else ""))
+        return out
+
+
+def run_size(rows, args, bundle, db, results):
+    # The upload is written chunk by chunk to a temporary file and parsed from
+    # there, so only the parsed frame is ever in memory (10M rows fit).
+    fd, path = tempfile.mkstemp(suffix=f".{args.format}", dir=args.tmp_dir)
+    os.close(fd)
+    try:
+        write_fleet(path, rows, seed=args.seed)
+        t = Timer(rows, "ingest", results)
+        with open(path, "rb") as upload:
+            df = t("parse", lambda: next(iter_upload(upload, args.format)))
+    finally:
+        os.remove(path)
+    X = df[bundle.features].to_numpy(dtype=np.float64)
+    scaled = t("scale", lambda: bundle.scaler.transform(X))
+    clusters = t("predict", lambda: bundle.kmeans.predict(scaled))
+    df["Predicted_Class"] = t("label", lambda: bundle.label_lookup[clusters])
+    df = t("enrich", lambda: enrich(df, bundle.anomaly_model),
+           note=None if bundle.anomaly_model is not None else "no anomaly_model.joblib: fitted per upload")
+    summary = BatchSummary()
+    summary.add(df)
+
+    batch_id = f"bench-{rows}"
+    in_mongo = rows <= args.mongo_max_rows
+    if in_mongo:
+        df["batch_id"] = batch_id
+        writer = BatchWriter(db["classified_results"], db["batch_jobs"], db["batch_chunks"],
+                             batch_rows=args.write_batch_rows, background=False, layout=args.layout)
+        writer.ensure_indexes()
+
+        def insert():
+            writer.start_job(batch_id)
+            writer.submit(batch_id, df)
+            writer.finish(batch_id, rows, summary.to_dict())
+
+        t("insert", insert, note=args.layout)
+
+    t = Timer(rows, "dashboard", results)
+    if in_mongo:
+        loaded = t("load", lambda: load_batch(db, batch_id, args.layout))
+    else:
+        loaded = df
+    loaded = loaded.drop(columns=[c for c in DERIVED if c in loaded.columns])
+    t("derive", lambda: derive(loaded.copy(), bundle.anomaly_model))
+    t("anomaly", lambda: detect_anomalies(loaded, bundle.anomaly_model))
+    if in_mongo:
+        # drop the stored aggregates so they are computed from the stored rows
+        db["batch_jobs"].update_one({"_id": batch_id}, {"$unset": {"summary": 1}})
+        t("aggregate", lambda: batch_aggregates(db, batch_id), note="from MongoDB")
+    else:
+        t("aggregate", lambda: BatchSummary().add(df), note="in memory")
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def compare(report, baseline_path, threshold, min_seconds):
+    """Print the slowdown of every stage against a previous run; return the regressions.
+
+    Stages that got slower by less than min_seconds are never counted, so
+    sub-millisecond stages do not flag timer noise.
+    """
+    with open(baseline_path) as f:
+        old_report = json.load(f)
+    baseline = {(r["rows"], r["path"], r["stage"]): r["seconds"] for r in old_report["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline_path} (slower than {threshold:.2f}x is a regression):")
+    for key in ("format", "layout", "anomaly_model", "cpu_count"):
+        if old_report.get(key) != report[key]:
+            print(f"  note: {key} differs ({old_report.get(key)} -> {report[key]})")
+    for r in report["results"]:
+        old = baseline.get((r["rows"], r["path"], r["stage"]))
+        if not old:
+            continue
+        ratio = r["seconds"] / old
+        flag = "REGRESSION" if ratio > threshold and r["seconds"] - old > min_seconds else ""
+        print(f"{r['rows']:>10} {r['path']:>10} {r['stage']:>10} {old:>10.4f}s -> {r['seconds']:.4f}s "
+              f"{ratio:>6.2f}x {flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="fleet sizes (1k to 10M)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--layout", choices=["rows", "columnar"], default="rows")
+    parser.add_argument("--write-batch-rows", type=int, default=5000)
+    parser.add_argument("--mongo-uri", default=os.environ.get("BENCH_MONGO_URI", "mongomock://localhost"))
+    parser.add_argument("--mongo-max-rows", type=int, default=1_000_000,
+                        help="larger sizes skip insert/load")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tmp-dir", help="where the synthetic upload is written (default: the system temp dir)")
+    parser.add_argument("--output", help="JSON file (default: benchmarks/results/<UTC time>.json)")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown that counts as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.005, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    bundle = ModelBundle.load(os.path.join(HERE, "..", "backend"))
+    if args.mongo_uri.startswith("mongomock://"):
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+    db = client["processor_bench"]
+
+    results = []
+    print(f"{'rows':>10} {'path':>10} {'stage':>10} {'time':>11} {'throughput':>21}")
+    try:
+        for rows in args.rows:
+            run_size(rows, args, bundle, db, results)
+    finally:
+        client.drop_database("processor_bench")
+
+    report = {**environment(), "format": args.format, "layout": args.layout,
+              "anomaly_model": bundle.anomaly_model is not None, "results": results}
+    output = args.output or os.path.join(HERE, "results",
+                                         datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.baseline and compare(report, args.baseline, args.threshold, args.min_seconds):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic GPU telemetry shaped like the data the models were trained on.
+
+Rows are drawn around the KMeans centroids in the scaler's [0, 1] space, in
+the proportions of the training clusters, and mapped back to real units
+with the scaler, so every feature stays inside the range it was fitted on.
+
+    python benchmarks/synthetic.py ROWS OUT.csv|OUT.parquet [--seed N]
+
+writes a fleet of any size chunk by chunk (10M rows need ~100 MB at a time).
+"""
+import argparse
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "backend")
+CHUNK_ROWS = 1_000_000
+# Spread around each centroid, in scaled units
+SPREAD = 0.06
+
+
+def load_models(model_dir=BACKEND_DIR):
+    kmeans = joblib.load(os.path.join(model_dir, "kmeans_model.joblib"))
+    scaler = joblib.load(os.path.join(model_dir, "scaler.joblib"))
+    return kmeans, scaler
+
+
+def iter_fleet(rows, chunk_rows=CHUNK_ROWS, seed=0, models=None):
+    """Yield DataFrames of GPU_ID plus the seven scaler features, rows in total."""
+    kmeans, scaler = models or load_models()
+    features = list(scaler.feature_names_in_)
+    centers = kmeans.cluster_centers_
+    weights = np.bincount(kmeans.labels_, minlength=len(centers)) if hasattr(kmeans, "labels_") else None
+    weights = weights / weights.sum() if weights is not None else np.full(len(centers), 1 / len(centers))
+    binary = [i for i, f in enumerate(features) if f == "overclock_proxy"]
+
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        cluster = rng.choice(len(centers), size=n, p=weights)
+        scaled = np.clip(centers[cluster] + rng.normal(0, SPREAD, (n, len(features))), 0, 1)
+        X = scaler.inverse_transform(scaled)
+        X[:, binary] = np.round(X[:, binary])
+        df = pd.DataFrame(X, columns=features)
+        df.insert(0, "GPU_ID", np.arange(start + 1, start + n + 1))
+        yield df
+
+
+def make_fleet(rows, seed=0, models=None):
+    return pd.concat(iter_fleet(rows, seed=seed, models=models), ignore_index=True)
+
+
+def write_fleet(path, rows, seed=0):
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        for df in iter_fleet(rows, seed=seed):
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        for i, df in enumerate(iter_fleet(rows, seed=seed)):
+            df.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int)
+    parser.add_argument("out", help=".csv or .parquet")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_fleet(args.out, args.rows, args.seed)
+    print(f"Wrote {args.rows} rows to {args.out}", file=sys.stderr)
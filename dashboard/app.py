@@ -1,15 +1,15 @@
+import time
+_run_start = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
-import joblib
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import datetime
 from pymongo import MongoClient
 import os
-import json
+import sys
 
 st.set_page_config(
     page_title="Processor Lifecycle Dashboard",
@@ -50,32 +50,46 @@ st.markdown(
 )
 
 
-MODELS_LOADED = False
-kmeans = None
-scaler = None
-label_map = None
-models_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend", "models"))
+# Classification happens in the backend; the dashboard reads Predicted_Class
+# from MongoDB and never needs its own copy of the KMeans artifacts.
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+# backend modules (columnar decoding, rules) are shared with the dashboard
+sys.path.insert(0, backend_dir)
+from aggregates import batch_aggregates, comparison_row
+from data import derive, gpu_positions, latest_batch, load_batch, lod_sample, recent_batches
+from forecast import RETIRE_LIFE_SCORE, fleet_forecast
+from history import GpuHistory
+from report import ReportService, write_comparison_report, write_fleet_report
+
+
+@st.cache_resource
+def startup_stats():
+    # Cold start of this dashboard process: imports and the first full run
+    return {"import_sec": time.perf_counter() - _run_start, "first_run_sec": None}
+
+
+startup_stats()
+
+
+@st.cache_resource(show_spinner=False)
+def mongo_db():
+    # One client (and connection pool) per process instead of a new client and
+    # a server_info() round trip on every rerun. Raises while MongoDB is
+    # unreachable, so a failed attempt is retried on the next run.
+    client = MongoClient(os.getenv("MONGODB_URI", ""), serverSelectionTimeoutMS=2000)
+    try:
+        client.server_info()
+    except Exception:
+        client.close()
+        raise
+    return client["processor_db"]
 
-try:
-    kmeans_path = os.path.join(models_dir, "kmeans_model.joblib")
-    scaler_path = os.path.join(models_dir, "scaler.joblib")
-    label_map_path = os.path.join(models_dir, "label_mapping.joblib")
-
-    if os.path.exists(kmeans_path) and os.path.exists(scaler_path) and os.path.exists(label_map_path):
-        kmeans = joblib.load(kmeans_path)
-        scaler = joblib.load(scaler_path)
-        label_map = joblib.load(label_map_path)
-        MODELS_LOADED = True
-except Exception as e:
-    MODELS_LOADED = False
 
 USE_MONGO = True
 try:
-    MONGO_URI = os.getenv("MONGODB_URI", "")
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=2000)
-    db = client["processor_db"]
+    db = mongo_db()
     collection = db["classified_results"]
-    client.server_info()
 except Exception:
     USE_MONGO = False
     collection = None
@@ -89,7 +103,9 @@ sections = {
     "Charts & Insights": "#charts",
     "AI Insights": "#ai-insights",
     "Maintenance & Recycling": "#maintenance",
-    "GPU Comparison": "#comparison"
+    "Fleet Analytics": "#fleet",
+    "GPU Comparison": "#comparison",
+    "GPU History": "#history"
 }
 
 for label, anchor in sections.items():
@@ -98,28 +114,146 @@ for label, anchor in sections.items():
 st.title(" Processor Lifecycle & Health Dashboard")
 st.markdown("---")
 
-df = None
+# How often the dashboard checks MongoDB for a newer batch. Everything derived
+# from a batch is cached under its batch_id, so a new upload only costs one
+# rebuild and an unchanged batch_id costs nothing.
+BATCH_POLL_SEC = int(os.getenv("BATCH_POLL_SEC", "5"))
+
+# Scatter plots with more GPUs than this are downsampled before they are sent
+# to the browser (anomalies are always plotted); 0 plots every GPU.
+PLOT_MAX_POINTS = int(os.getenv("PLOT_MAX_POINTS", "5000"))
+
+# Batches preselected in Fleet Analytics (the newest ones)
+FLEET_DEFAULT_BATCHES = 5
+
+
+@st.cache_resource
+def cache_stats():
+    # shared by every session in this process
+    return {"calls": 0, "misses": 0, "rebuild_sec": None}
+
+
+@st.cache_resource
+def load_anomaly_model():
+    # trained offline by backend/train_anomaly.py; loaded once per process.
+    # Unpickling it imports sklearn, so it is only loaded for batches stored
+    # without anomaly flags.
+    import joblib
+
+    path = os.path.join(backend_dir, "anomaly_model.joblib")
+    return joblib.load(path) if os.path.exists(path) else None
+
+
+@st.cache_data(ttl=BATCH_POLL_SEC, show_spinner=False)
+def current_batch():
+    return latest_batch(db)
+
+
+@st.cache_data(max_entries=4, show_spinner="Loading latest batch...")
+def load_derived(batch_id, layout):
+    start = datetime.datetime.now()
+    batch_df = load_batch(db, batch_id, layout)
+    if not batch_df.empty:
+        batch_df = derive(batch_df, None if "Anomaly" in batch_df.columns else load_anomaly_model())
+    stats = cache_stats()
+    stats["misses"] += 1
+    stats["rebuild_sec"] = (datetime.datetime.now() - start).total_seconds()
+    return batch_df
+
+
+@st.cache_data(ttl=BATCH_POLL_SEC, show_spinner=False)
+def load_batches():
+    return recent_batches(db)
+
+
+@st.cache_resource(max_entries=4)
+def batch_gpu_positions(batch_id, _df):
+    # _df is the cached frame of batch_id. cache_resource returns the same
+    # object every run, so the index's hash table is built once per batch.
+    return gpu_positions(_df)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_summary(batch_id):
+    # a few KB of aggregates instead of recomputing them from the rows
+    return batch_aggregates(db, batch_id)
+
+
+@st.cache_data(max_entries=4, show_spinner="Forecasting remaining life...")
+def load_forecast(batch_id, _df):
+    # _df is the cached frame of batch_id; the forecast uses history up to the batch's start
+    header = db["batch_jobs"].find_one({"_id": batch_id}, {"created_at": 1})
+    as_of = datetime.datetime.fromisoformat(header["created_at"]) if header else None
+    return fleet_forecast(GpuHistory(db), _df, as_of)
+
+
+@st.cache_data(ttl=BATCH_POLL_SEC, max_entries=32, show_spinner=False)
+def load_trend(gpu_id):
+    return GpuHistory(db).trend(gpu_id)
+
+
+def plot_points(frame, max_points, anomalies=False):
+    # Only the anomaly scatter favours anomalies (up to half of its points);
+    # the health-class plots get a plain class-stratified sample.
+    keep = frame["Anomaly_Label"] == "Anomaly" if anomalies else None
+    return lod_sample(frame, max_points, by=("health_class",), keep=keep)
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def batch_plot_points(batch_id, max_points, _df, anomalies=False):
+    # _df is the cached frame of batch_id, so the sample is cached under the same key
+    return plot_points(_df, max_points, anomalies)
+
+
+def lod_caption(plotted, total, anomalies=False):
+    if len(plotted) < len(total):
+        kept = "anomalies kept first" if anomalies else "stratified by class"
+        st.caption(f"Level of detail: {len(plotted):,} of {len(total):,} GPUs plotted ({kept})")
+
+
+@st.cache_resource
+def report_service():
+    # one report worker and one cache of finished reports for every session
+    return ReportService()
+
+
+def report_panel(key, file_name, download_key):
+    """Show progress for the report built under key, then its download button."""
+    job = report_service().get(key)
+    if job is None:
+        return
+    building = job["status"] in ("queued", "running")
+
+    # Only the progress bar reruns while the report is built; the rest of the page stays put
+    @st.fragment(run_every=1 if building else None)
+    def panel():
+        if job["status"] in ("queued", "running"):
+            done, total = job["done"], job["total"]
+            st.progress(done / total if total else 0.0, text=f"Building report... {done:,} / {total:,} GPUs")
+        elif building:
+            st.rerun()
+        elif job["status"] == "failed":
+            st.error(f"❌ Report failed: {job['error']}")
+        elif os.path.exists(job["path"]):
+            with open(job["path"], "rb") as f:
+                st.download_button(label="⬇️ Download PDF Report", data=f.read(), file_name=file_name,
+                                   mime="application/pdf", key=download_key)
+            st.success("✅ Report generated successfully!")
+
+    panel()
 
 
 df = None
 
 if USE_MONGO:
     try:
-        data = list(collection.find({}, {"_id": 0}).sort("_id", -1))
-        if len(data) > 0:
-            df = pd.DataFrame(data)
-
-            # fallback for cluster
-            if "cluster" not in df.columns:
-                df["cluster"] = "N/A"
+        latest = current_batch()
+        if latest is not None:
+            cache_stats()["calls"] += 1
+            df = load_derived(*latest)
+            summary = load_summary(latest[0])
 
-            # group by latest batch
-            if "batch_id" in df.columns:
-                batches = sorted(df["batch_id"].unique())
-                df = df[df["batch_id"] == batches[-1]]
-
-            
-        else:
+        if df is None or df.empty:
             st.warning("⚠️ No data found. Upload a CSV from the React app first.")
             st.stop()
     except Exception as e:
@@ -129,38 +263,48 @@ else:
     st.info("⏳ Waiting for data from the React application...")
     st.stop()
 
-
-
-expected_cols = ["overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
-                 "avg_sm_pct", "avg_mem_pct", "thermal_score"]
-for c in expected_cols:
-    if c not in df.columns:
-        df[c] = 0
-
-if "GPU_ID" not in df.columns:
-    df["GPU_ID"] = df.index + 1
-
-if "health_class" not in df.columns and "Predicted_Class" in df.columns:
-    df["health_class"] = df["Predicted_Class"]
-
-if "life_score" not in df.columns:
-    df["life_score"] = (100 - (df["thermal_score"] + df["avg_sm_pct"] / 2)).clip(0, 100)
+stats = cache_stats()
+st.sidebar.markdown("---")
+st.sidebar.markdown("### Data Cache")
+st.sidebar.caption(f"Batch: {latest[0]}")
+st.sidebar.caption(f"Hits: {stats['calls'] - stats['misses']} • Misses: {stats['misses']}")
+if stats["rebuild_sec"] is not None:
+    st.sidebar.caption(f"Last rebuild: {stats['rebuild_sec']:.2f}s")
+startup = startup_stats()
+if startup["first_run_sec"] is not None:
+    st.sidebar.caption(f"Cold start: imports {startup['import_sec']:.2f}s • first run {startup['first_run_sec']:.2f}s")
+
+st.sidebar.markdown("### Plots")
+max_points = 0 if st.sidebar.checkbox("Plot every GPU", value=PLOT_MAX_POINTS <= 0, key="plot_all") else PLOT_MAX_POINTS
+if max_points:
+    plot_df = batch_plot_points(latest[0], max_points, df)
+    anomaly_plot_df = batch_plot_points(latest[0], max_points, df, anomalies=True)
+else:
+    plot_df = anomaly_plot_df = df
 
 # -------- Health Summary ----------
 st.markdown("<a name='health-summary'></a>", unsafe_allow_html=True)
 st.markdown("#### Health Summary")
 
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.metric("Average Life Score", f"{df['life_score'].mean():.1f} / 100")
-with col2:
+# Batches enriched at ingest come with these aggregates precomputed
+if summary is not None:
+    avg_life = summary["mean_life_score"]
+    most_common = summary["most_common_class"]
+    high_risk = summary["high_risk"]
+else:
+    avg_life = df['life_score'].mean()
     try:
         most_common = df["health_class"].mode()[0]
     except Exception:
         most_common = "N/A"
+    high_risk = int(df[df["life_score"] < 30].shape[0])
+
+col1, col2, col3 = st.columns(3)
+with col1:
+    st.metric("Average Life Score", f"{avg_life:.1f} / 100")
+with col2:
     st.metric("Most Common Condition", most_common)
 with col3:
-    high_risk = int(df[df["life_score"] < 30].shape[0])
     st.metric("High-Risk Units", high_risk, delta=f"-{high_risk}" if high_risk > 0 else "0")
 
 st.markdown("---")
@@ -168,91 +312,9 @@ st.markdown("---")
 st.markdown("### 🧾 Download Lifecycle Report")
 
 if st.button("📄 Generate Full Report", key="generate_full_report"):
-    import io
-    from sklearn.ensemble import IsolationForest
-
-    # create in-memory buffer
-    pdf_buffer = io.BytesIO()
-    pdf_canvas = canvas.Canvas(pdf_buffer, pagesize=letter)
-    width, height = letter
-
-    # Title
-    pdf_canvas.setFont("Helvetica-Bold", 16)
-    pdf_canvas.drawString(160, height - 50, "Processor Lifecycle Summary Report")
-
-    pdf_canvas.setFont("Helvetica", 12)
-    pdf_canvas.drawString(50, height - 80, f"Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    pdf_canvas.drawString(50, height - 100, f"Total GPUs Analyzed: {len(df)}")
-
-    # Key metrics
-    avg_life = df['life_score'].mean() if not df['life_score'].empty else 0.0
-    most_common = df['health_class'].mode()[0] if "health_class" in df.columns and not df['health_class'].empty else "N/A"
-    high_risk = int(df[df['life_score'] < 30].shape[0])
-    pdf_canvas.drawString(50, height - 130, f"Average Life Score: {avg_life:.2f} / 100")
-    pdf_canvas.drawString(50, height - 150, f"Most Common Condition: {most_common}")
-    pdf_canvas.drawString(50, height - 170, f"High-Risk Units: {high_risk}")
-
-    # --- Detect anomalies and list GPU IDs ---
-    features = ["avg_power_watts", "avg_sm_pct", "avg_mem_pct"]
-    # guard: ensure features exist and have no NaNs
-    for feat in features:
-        if feat not in df.columns:
-            df[feat] = 0
-    iso = IsolationForest(contamination=0.1, random_state=42)
-    try:
-        iso_vals = iso.fit_predict(df[features])
-        df = df.copy()
-        df["Anomaly"] = iso_vals
-        df["Anomaly_Label"] = df["Anomaly"].apply(lambda x: "Anomaly" if x == -1 else "Normal")
-        anomaly_gpus = df.loc[df["Anomaly_Label"] == "Anomaly", "GPU_ID"].tolist()
-    except Exception:
-        anomaly_gpus = []
-
-    # Add anomaly summary to report
-    y_anom = height - 200
-    pdf_canvas.setFont("Helvetica-Bold", 12)
-    pdf_canvas.drawString(50, y_anom, f"Detected Anomalies: {len(anomaly_gpus)}")
-    pdf_canvas.setFont("Helvetica", 10)
-    y_anom -= 18
-    if anomaly_gpus:
-        for gpu_id in anomaly_gpus:
-            pdf_canvas.drawString(60, y_anom, f"⚠️ GPU_ID: {gpu_id}")
-            y_anom -= 14
-            if y_anom < 100:
-                pdf_canvas.showPage()
-                y_anom = height - 50
-    else:
-        pdf_canvas.drawString(60, y_anom, "No anomalies detected.")
-        y_anom -= 18
-
-    # GPU per-row summary (paginate if necessary)
-    pdf_canvas.setFont("Helvetica-Bold", 12)
-    y = y_anom - 10
-    pdf_canvas.drawString(50, y, "GPU Summary:")
-    y -= 18
-    pdf_canvas.setFont("Helvetica", 10)
-    for _, row in df.iterrows():
-        gpu_id = row.get("GPU_ID", "N/A")
-        health = row.get("health_class", row.get("Predicted_Class", "N/A"))
-        life = row.get("life_score", 0.0)
-        pdf_canvas.drawString(50, y, f"GPU_ID: {gpu_id} | Class: {health} | Life Score: {life:.1f}")
-        y -= 14
-        if y < 100:
-            pdf_canvas.showPage()
-            y = height - 50
-
-    # finalize PDF
-    pdf_canvas.save()
-    pdf_buffer.seek(0)
-
-    st.download_button(
-        label="⬇️ Download PDF Report",
-        data=pdf_buffer,
-        file_name="Processor_Lifecycle_Report.pdf",
-        mime="application/pdf",
-        key="download_full_pdf"
-    )
-    st.success("✅ Report generated successfully!")
+    report_service().submit(("fleet", latest[0]), write_fleet_report, df,
+                            {"avg_life": avg_life, "most_common": most_common, "high_risk": high_risk})
+report_panel(("fleet", latest[0]), "Processor_Lifecycle_Report.pdf", "download_full_pdf")
 
 st.markdown("---")
 # -------- Charts ----------
@@ -263,7 +325,10 @@ col1, col2 = st.columns(2)
 with col1:
     st.markdown("#### GPU Stress Profile")
     numeric_cols = ["avg_power_watts", "avg_sm_pct", "avg_mem_pct", "usage_hours"]
-    radar_sample = df[numeric_cols].mean()
+    if summary is not None:
+        radar_sample = pd.Series(summary["means"])[numeric_cols].fillna(0)
+    else:
+        radar_sample = df[numeric_cols].mean()
     radar = go.Figure(data=go.Scatterpolar(
         r=radar_sample.values,
         theta=numeric_cols,
@@ -280,7 +345,7 @@ with col1:
 
 with col2:
     st.markdown("#### Remaining Life Gauge")
-    avg_life = float(df["life_score"].mean())
+    avg_life = float(avg_life)
     gauge = go.Figure(go.Indicator(
         mode="gauge+number",
         value=avg_life,
@@ -304,39 +369,40 @@ st.markdown("---")
 col3, col4 = st.columns(2)
 with col3:
     st.markdown("#### Cluster Positioning")
-    fig = px.scatter(df, x="avg_power_watts", y="thermal_score", color="health_class",
+    fig = px.scatter(plot_df, x="avg_power_watts", y="thermal_score", color="health_class",
                      color_discrete_map={"Healthy": "rgb(16,185,129)", "Moderate": "rgb(251,191,36)", "Critical": "rgb(239,68,68)"},
                      hover_data=["GPU_ID", "life_score"])
     fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)', font=dict(color='white'))
     st.plotly_chart(fig, use_container_width=True, key="scatter_chart")
+    lod_caption(plot_df, df)
 with col4:
     st.markdown("#### Health Distribution")
-    pie = px.pie(df, names="health_class", color="health_class",
+    if summary is not None:
+        health_counts = pd.Series(summary["class_counts"])
+    else:
+        health_counts = df["health_class"].value_counts()
+    pie = px.pie(names=health_counts.index, values=health_counts.values, color=health_counts.index,
                  color_discrete_map={"Healthy": "rgb(16,185,129)", "Moderate": "rgb(251,191,36)", "Critical": "rgb(239,68,68)"})
     pie.update_layout(paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'))
     st.plotly_chart(pie, use_container_width=True, key="pie_chart")
 
+st.markdown("#### Life Score Distribution")
+if summary is not None:
+    hist_edges = summary["life_score_hist"]["edges"]
+    hist_counts = summary["life_score_hist"]["counts"]
+else:
+    hist_counts, hist_edges = np.histogram(df["life_score"], bins=20, range=(0, 100))
+hist = px.bar(x=[f"{lo}-{hi}" for lo, hi in zip(hist_edges[:-1], hist_edges[1:])], y=hist_counts,
+              labels={"x": "Life Score", "y": "GPUs"}, color_discrete_sequence=["rgb(59,130,246)"])
+hist.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)', font=dict(color='white'))
+st.plotly_chart(hist, use_container_width=True, key="life_hist_chart")
+
 st.markdown("---")
 
 # -------- Maintenance & Recycling ----------
 st.markdown("<a name='maintenance'></a>", unsafe_allow_html=True)
 st.markdown("### Maintenance & Recycling Recommendations")
 
-def get_recommendations(row):
-    recs = []
-    if row.get("thermal_score", 0) > 18: recs.append("Clean fans, reapply thermal paste")
-    if row.get("avg_power_watts", 0) > 180: recs.append("Lower power limit or increase cooling")
-    if row.get("avg_sm_pct", 0) > 70 and row.get("overclock_proxy", 0) == 1: recs.append("Reduce overclock or enforce power cap")
-    return ", ".join(recs) if recs else "None"
-
-def recycling_category(row):
-    if row.get("life_score", 0) > 70: return "✅ Can continue use"
-    elif row.get("life_score", 0) > 40: return "⚠️ Consider partial recycling"
-    else: return "🔴 Recycle / Retire"
-
-df["Maintenance"] = df.apply(get_recommendations, axis=1)
-df["Recycling"] = df.apply(recycling_category, axis=1)
-
 display_cols = ["GPU_ID","health_class","life_score","Maintenance","Recycling",
                 "usage_hours","avg_power_watts","peak_power_watts","avg_sm_pct","avg_mem_pct","thermal_score"]
 display_cols = [c for c in display_cols if c in df.columns]
@@ -344,6 +410,31 @@ st.dataframe(df[display_cols].reset_index(drop=True), use_container_width=True,
 
 st.markdown("---")
 
+# -------- Remaining Useful Life ----------
+st.markdown("### Remaining Useful Life Forecast")
+
+rul = load_forecast(latest[0], df)
+days = rul["days_to_retire"]
+col_r1, col_r2, col_r3 = st.columns(3)
+with col_r1:
+    st.metric("Retiring Within 90 Days", int((days <= 90).sum()))
+with col_r2:
+    declining = days[np.isfinite(days) & (days > 0)]
+    st.metric("Median Days to Retire", f"{declining.median():.0f}" if len(declining) else "N/A")
+with col_r3:
+    st.metric("Not Enough History", int(days.isna().sum()))
+
+upcoming = rul[np.isfinite(days) & (days > 0)].nsmallest(20, "days_to_retire")
+if upcoming.empty:
+    st.info(f"Forecasts need each GPU in at least two batches a day or more apart. "
+            f"GPUs already at or below a life score of {RETIRE_LIFE_SCORE} count as retiring now.")
+else:
+    st.caption(f"GPUs expected to reach the Recycle / Retire band (life score ≤ {RETIRE_LIFE_SCORE}) soonest")
+    st.dataframe(upcoming.rename(columns={"slope_per_day": "life_score_change_per_day"})
+                 .drop(columns=["intercept"]).reset_index(drop=True), use_container_width=True)
+
+st.markdown("---")
+
 # -------- AI Insights Section ----------
 st.markdown("<a name='ai-insights'></a>", unsafe_allow_html=True)
 st.markdown("## AI Insights & Advanced Analytics")
@@ -359,9 +450,16 @@ st.sidebar.markdown("---")
 st.markdown("### GPU Filter Panel")
 gpu_filter = st.multiselect("Select specific GPUs to display", df["GPU_ID"].unique())
 filtered_df = df[df["GPU_ID"].isin(gpu_filter)] if gpu_filter else df
+if not gpu_filter:
+    filtered_plot_df, filtered_anomaly_df = plot_df, anomaly_plot_df
+elif max_points:
+    filtered_plot_df = plot_points(filtered_df, max_points)
+    filtered_anomaly_df = plot_points(filtered_df, max_points, anomalies=True)
+else:
+    filtered_plot_df = filtered_anomaly_df = filtered_df
 
 # Hide unwanted columns
-hide_cols = ["Predicted_Class", "cluster"]
+hide_cols = ["Predicted_Class", "cluster", "Anomaly", "Anomaly_Score", "Workload"]
 filtered_display = filtered_df.drop(columns=[c for c in hide_cols if c in filtered_df.columns])
 
 st.dataframe(filtered_display, use_container_width=True, height=300)
@@ -370,7 +468,11 @@ st.dataframe(filtered_display, use_container_width=True, height=300)
 # --- Correlation Heatmap ---
 st.markdown("### Correlation Heatmap (Feature Relationships)")
 import plotly.express as px
-corr = filtered_df.corr(numeric_only=True)
+if gpu_filter or summary is None:
+    corr = filtered_display.corr(numeric_only=True)
+else:
+    corr_cols = summary["corr"]["columns"]
+    corr = pd.DataFrame(summary["corr"]["matrix"], index=corr_cols, columns=corr_cols, dtype=float)
 fig_corr = px.imshow(
     corr,
     text_auto=True,
@@ -387,11 +489,6 @@ st.plotly_chart(fig_corr, use_container_width=True, key="corr_heatmap")
 
 # --- Anomaly Detection ---
 st.markdown("### AI-Powered Anomaly Detection")
-from sklearn.ensemble import IsolationForest
-iso = IsolationForest(contamination=0.1, random_state=42)
-features = ["avg_power_watts", "avg_sm_pct", "avg_mem_pct"]
-filtered_df["Anomaly"] = iso.fit_predict(filtered_df[features])
-filtered_df["Anomaly_Label"] = filtered_df["Anomaly"].apply(lambda x: "Anomaly" if x == -1 else "Normal")
 
 col_a1, col_a2 = st.columns(2)
 with col_a1:
@@ -400,7 +497,7 @@ with col_a2:
     st.metric("Normal GPUs", int((filtered_df["Anomaly_Label"] == "Normal").sum()))
 
 fig_anomaly = px.scatter(
-    filtered_df,
+    filtered_anomaly_df,
     x="avg_power_watts",
     y="avg_sm_pct",
     color="Anomaly_Label",
@@ -413,11 +510,12 @@ fig_anomaly.update_layout(
     font=dict(color='white')
 )
 st.plotly_chart(fig_anomaly, use_container_width=True, key="anomaly_chart")
+lod_caption(filtered_anomaly_df, filtered_df, anomalies=True)
 
 # --- 3D Cluster Visualization ---
 st.markdown("### 3D Cluster Visualization")
 fig_3d = px.scatter_3d(
-    filtered_df,
+    filtered_plot_df,
     x="avg_power_watts",
     y="avg_sm_pct",
     z="avg_mem_pct",
@@ -430,6 +528,55 @@ fig_3d.update_layout(
     font=dict(color='white')
 )
 st.plotly_chart(fig_3d, use_container_width=True, key="3d_cluster_chart")
+lod_caption(filtered_plot_df, filtered_df)
+
+st.markdown("---")
+
+# -------- Fleet Analytics ----------
+
+st.markdown("<a name='fleet'></a>", unsafe_allow_html=True)
+st.markdown("### Fleet Analytics Across Batches")
+
+# Built from each batch's stored aggregates (see load_summary), so comparing
+# batches never loads their rows.
+batches = load_batches()
+batch_created = {b: created for b, created, _ in batches}
+batch_labels = {b: f"{(created or b)[:19]} ({rows or 0:,} GPUs)" for b, created, rows in batches}
+selected_batches = st.multiselect("Batches to compare", list(batch_labels),
+                                  default=list(batch_labels)[:FLEET_DEFAULT_BATCHES],
+                                  format_func=batch_labels.get, key="fleet_batches")
+fleet = pd.DataFrame([comparison_row(b, s, batch_created[b]) for b in selected_batches
+                      if (s := load_summary(b)) is not None])
+if fleet.empty:
+    st.info("Select one or more batches to compare.")
+else:
+    fleet = fleet.sort_values("created_at", na_position="first")
+    fleet["Batch"] = fleet["created_at"].fillna(fleet["batch_id"]).str[:19]
+
+    shares = pd.DataFrame([{"Batch": batch, "Class": cls, "Share": share}
+                           for batch, mix in zip(fleet["Batch"], fleet["class_share"]) for cls, share in mix.items()])
+    fig_mix = px.bar(shares, x="Batch", y="Share", color="Class", title="Class Distribution by Batch")
+    fig_mix.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)', font=dict(color='white'),
+                          yaxis=dict(tickformat=".0%"))
+    st.plotly_chart(fig_mix, use_container_width=True, key="fleet_mix_chart")
+
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        fig_rate = px.bar(fleet, x="Batch", y="anomaly_rate", title="Anomaly Rate by Batch",
+                          labels={"anomaly_rate": "Anomaly Rate"})
+        fig_rate.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)',
+                               font=dict(color='white'), yaxis=dict(tickformat=".1%"))
+        st.plotly_chart(fig_rate, use_container_width=True, key="fleet_anomaly_chart")
+    with col_f2:
+        fig_eff = px.bar(fleet, x="Batch", y="efficiency_mean", error_y="efficiency_std",
+                         title="Efficiency by Batch (SM % per Watt, mean ± std)",
+                         labels={"efficiency_mean": "Efficiency"})
+        fig_eff.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)', font=dict(color='white'))
+        st.plotly_chart(fig_eff, use_container_width=True, key="fleet_efficiency_chart")
+
+    st.dataframe(fleet[["Batch", "rows", "mean_life_score", "anomaly_rate", "efficiency_mean"]].rename(columns={
+        "rows": "GPUs", "mean_life_score": "Avg Life Score", "anomaly_rate": "Anomaly Rate",
+        "efficiency_mean": "Efficiency"}), use_container_width=True, hide_index=True)
 
 st.markdown("---")
 
@@ -446,8 +593,9 @@ with colB:
     gpu2 = st.selectbox("Select GPU 2", gpu_list, key="gpu2_select")
 
 if gpu1 != gpu2:
-    gpu_a = df[df["GPU_ID"] == gpu1].iloc[0]
-    gpu_b = df[df["GPU_ID"] == gpu2].iloc[0]
+    positions = batch_gpu_positions(latest[0], df)
+    gpu_a = df.iloc[positions[gpu1]]
+    gpu_b = df.iloc[positions[gpu2]]
 
     col1, col2 = st.columns(2)
     with col1:
@@ -464,58 +612,46 @@ if gpu1 != gpu2:
     eff_chart.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.4)', font=dict(color='white'))
     st.plotly_chart(eff_chart, use_container_width=True, key="eff_chart")
 
-    def workload_recommendation(row):
-        if row.get("avg_sm_pct", 0) > row.get("avg_mem_pct", 0): return "Compute-Intensive Workloads (AI/ML, HPC)"
-        elif row.get("avg_mem_pct", 0) > row.get("avg_sm_pct", 0): return "Memory-Intensive Workloads (Rendering, Video Processing)"
-        else: return "Balanced Workloads"
-
-    rec1 = workload_recommendation(gpu_a)
-    rec2 = workload_recommendation(gpu_b)
+    rec1 = gpu_a["Workload"]
+    rec2 = gpu_b["Workload"]
     st.markdown("### Recommended Optimal Usage Profiles")
     st.info(f"**GPU {gpu1} →** {rec1}\n\n**GPU {gpu2} →** {rec2}")
 
     st.markdown("### 📝 Export Comparison Report")
 
-    def export_comparison_pdf(gpu1, gpu2, df_local):
-        gpu_a = df_local[df_local["GPU_ID"] == gpu1].iloc[0]
-        gpu_b = df_local[df_local["GPU_ID"] == gpu2].iloc[0]
-        pdf_path = f"gpu_comparison_report_{gpu1}_vs_{gpu2}.pdf"
-        c = canvas.Canvas(pdf_path, pagesize=letter)
-        width, height = letter
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(50, height - 50, f"GPU Comparison Report: GPU {gpu1} vs GPU {gpu2}")
-        c.setFont("Helvetica", 12)
-        c.drawString(50, height - 80, f"Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        y_position = height - 120
-        for col, label in [("health_class","Health"),("life_score","Life Score"),("usage_hours","Usage Hours"),
-                           ("avg_power_watts","Avg Power (W)"),("peak_power_watts","Peak Power (W)"),
-                           ("avg_sm_pct","Avg Compute (%)"),("avg_mem_pct","Avg Memory (%)"),
-                           ("thermal_score","Thermal Score")]:
-            a_val = gpu_a.get(col, "N/A")
-            b_val = gpu_b.get(col, "N/A")
-            c.drawString(50, y_position, f"{label} GPU {gpu1}: {a_val}")
-            c.drawString(300, y_position, f"{label} GPU {gpu2}: {b_val}")
-            y_position -= 20
-        gpu_a_eff = gpu_a.get("avg_sm_pct", 0) / max(gpu_a.get("avg_power_watts", 1), 1)
-        gpu_b_eff = gpu_b.get("avg_sm_pct", 0) / max(gpu_b.get("avg_power_watts", 1), 1)
-        rec_a = workload_recommendation(gpu_a)
-        rec_b = workload_recommendation(gpu_b)
-        c.drawString(50, y_position-10, f"Efficiency Score GPU {gpu1}: {gpu_a_eff:.2f}")
-        c.drawString(300, y_position-10, f"Efficiency Score GPU {gpu2}: {gpu_b_eff:.2f}")
-        y_position -= 30
-        c.drawString(50, y_position, f"Recommendation GPU {gpu1}: {rec_a}")
-        c.drawString(300, y_position, f"Recommendation GPU {gpu2}: {rec_b}")
-        c.save()
-        return pdf_path
-
     if st.button("Generate PDF Report", key="gen_pdf"):
-        pdf_path = export_comparison_pdf(gpu1, gpu2, df)
-        with open(pdf_path, "rb") as f:
-            pdf_bytes = f.read()
-        st.download_button(label="📥 Download PDF", data=pdf_bytes, file_name=f"GPU_Comparison_{gpu1}_vs_{gpu2}.pdf", mime="application/pdf", key="download_pdf")
-        st.success("✅ PDF ready for download!")
+        report_service().submit(("compare", latest[0], gpu1, gpu2), write_comparison_report,
+                                gpu1, gpu2, gpu_a, gpu_b)
+    report_panel(("compare", latest[0], gpu1, gpu2), f"GPU_Comparison_{gpu1}_vs_{gpu2}.pdf", "download_pdf")
 
     
 
+st.markdown("---")
+
+# -------- GPU History ----------
+st.markdown("<a name='history'></a>", unsafe_allow_html=True)
+st.markdown("### Life Score Over Time")
+
+history_gpu = st.selectbox("Select GPU", gpu_list, key="history_gpu_select")
+trend = load_trend(history_gpu)
+if not trend["points"]:
+    st.info("No history recorded for this GPU yet.")
+else:
+    trend_df = pd.DataFrame(trend["points"])
+    slope = trend["life_score_per_day"]
+    col_h1, col_h2 = st.columns(2)
+    with col_h1:
+        st.metric("Batches Seen", int(trend_df["count"].sum()))
+    with col_h2:
+        st.metric("Life Score Change / Day", f"{slope:+.3f}" if slope is not None else "N/A")
+    fig_trend = px.line(trend_df, x="ts", y="life_score", markers=True,
+                        labels={"ts": "Time", "life_score": "Life Score"}, title=f"GPU {history_gpu}")
+    fig_trend.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(30,41,59,0.5)',
+                            font=dict(color='white'), yaxis=dict(range=[0, 100]))
+    st.plotly_chart(fig_trend, use_container_width=True, key="history_chart")
+
+if startup["first_run_sec"] is None:
+    startup["first_run_sec"] = time.perf_counter() - _run_start
+
 st.markdown("---")
 st.caption("Powered by ReCore • Sustainable GPU Lifecycle Management - Anusriya.S23BCE1360")
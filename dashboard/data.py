@@ -0,0 +1,133 @@
+"""MongoDB access for the dashboard and the per-batch derived columns."""
+import numpy as np
+import pandas as pd
+
+from columnar import decode_chunks
+from enrich import detect_anomalies
+from rules import maintenance, recycling, workload
+
+# Columns the dashboard renders; everything else stays in MongoDB.
+DASHBOARD_COLS = ["GPU_ID", "Predicted_Class", "health_class", "cluster", "life_score",
+                  "overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+                  "avg_sm_pct", "avg_mem_pct", "thermal_score",
+                  "Maintenance", "Recycling", "Workload", "Anomaly", "Anomaly_Score"]
+
+EXPECTED_COLS = ["overclock_proxy", "usage_hours", "avg_power_watts", "peak_power_watts",
+                 "avg_sm_pct", "avg_mem_pct", "thermal_score"]
+
+
+def latest_batch(db):
+    """Return (batch_id, layout) of the newest fully written batch, or None.
+
+    batch_jobs is keyed by batch_id, so this is a single lookup on its _id
+    index. Uploads made before batch_jobs existed fall back to the
+    classified_results batch_id index; batch_id is None only for rows that
+    were stored without one.
+    """
+    header = db["batch_jobs"].find_one({"status": "done"}, {"layout": 1}, sort=[("_id", -1)])
+    if header is not None:
+        return header["_id"], header.get("layout", "rows")
+    row = db["classified_results"].find_one({}, {"batch_id": 1}, sort=[("batch_id", -1)])
+    if row is None:
+        return None
+    return row.get("batch_id"), "rows"
+
+
+def recent_batches(db, limit=100):
+    """Fully written batches, newest first, as (batch_id, created_at, total_records) tuples."""
+    headers = db["batch_jobs"].find({"status": "done"}, {"created_at": 1, "total_records": 1},
+                                    sort=[("_id", -1)], limit=limit)
+    return [(h["_id"], h.get("created_at"), h.get("total_records")) for h in headers]
+
+
+def load_batch(db, batch_id, layout, columns=DASHBOARD_COLS):
+    if layout == "columnar":
+        projection = {"_id": 0, "batch_id": 1, "seq": 1, **{f"columns.{c}": 1 for c in columns}}
+        chunks = db["batch_chunks"].find({"batch_id": batch_id}, projection).sort("seq", 1)
+        return decode_chunks(chunks, columns)
+
+    query = {} if batch_id is None else {"batch_id": batch_id}
+    projection = {"_id": 0, "batch_id": 1, **{c: 1 for c in columns}}
+    return pd.DataFrame(list(db["classified_results"].find(query, projection)))
+
+
+def derive(df, anomaly_model=None):
+    """Fill in missing columns and add everything the dashboard derives per batch.
+
+    Batches enriched by the backend at ingest already carry life_score,
+    Maintenance, Recycling, Workload and Anomaly; they are only computed here
+    for older batches, scoring with the pre-trained anomaly model if given.
+    Only depends on the batch contents, so the result can be cached by
+    batch_id.
+    """
+    if "cluster" not in df.columns:
+        df["cluster"] = "N/A"
+
+    for c in EXPECTED_COLS:
+        if c not in df.columns:
+            df[c] = 0
+
+    if "GPU_ID" not in df.columns:
+        df["GPU_ID"] = df.index + 1
+
+    if "health_class" not in df.columns and "Predicted_Class" in df.columns:
+        df["health_class"] = df["Predicted_Class"]
+
+    if "life_score" not in df.columns:
+        df["life_score"] = (100 - (df["thermal_score"] + df["avg_sm_pct"] / 2)).clip(0, 100)
+
+    if "Maintenance" not in df.columns:
+        df["Maintenance"] = maintenance(df)
+    if "Recycling" not in df.columns:
+        df["Recycling"] = recycling(df)
+    if "Workload" not in df.columns:
+        df["Workload"] = workload(df)
+
+    if "Anomaly" not in df.columns:
+        df["Anomaly"], df["Anomaly_Score"] = detect_anomalies(df, anomaly_model)
+    df["Anomaly_Label"] = np.where(df["Anomaly"] == -1, "Anomaly", "Normal")
+    return df
+
+
+def lod_sample(df, max_points, by=("health_class",), keep=None, seed=0):
+    """Return at most about max_points rows of df for a scatter plot.
+
+    Rows where keep is True (e.g. the anomalies) are included first, up to
+    half of max_points; beyond that they are sampled down too. The rest is
+    sampled per stratum of `by`, in proportion to the stratum's size and
+    with at least one row each, so small classes stay visible. The sample
+    is deterministic for a given seed and keeps df's row order.
+    """
+    if len(df) <= max_points:
+        return df
+    rng = np.random.default_rng(seed)
+    keep = np.zeros(len(df), dtype=bool) if keep is None else np.asarray(keep, dtype=bool)
+    kept = np.flatnonzero(keep)
+    if len(kept) > max_points // 2:
+        kept = np.sort(rng.choice(kept, max_points // 2, replace=False))
+    rest = np.flatnonzero(~keep)
+    if not len(rest):
+        return df.iloc[kept]
+
+    codes = df.iloc[rest].groupby(list(by), sort=False, dropna=False).ngroup().to_numpy()
+    sizes = np.bincount(codes)
+    budget = max_points - len(kept)
+    quota = np.maximum(1, np.round(sizes * budget / len(rest))).astype(np.int64)
+
+    # Rank rows within their stratum in random order; take the first `quota`
+    order = np.lexsort((rng.random(len(codes)), codes))
+    starts = np.cumsum(sizes) - sizes
+    ranks = np.empty(len(codes), dtype=np.int64)
+    ranks[order] = np.arange(len(codes)) - starts[codes[order]]
+    chosen = rest[ranks < quota[codes]]
+    return df.iloc[np.sort(np.concatenate([kept, chosen]))]
+
+
+def gpu_positions(df):
+    """GPU_ID -> row position (of its first row) in df.
+
+    A Series on a hashed index, so each lookup is a hash probe instead of a
+    boolean scan over the whole batch: positions.get(gpu_id) -> int or None.
+    """
+    first = ~df["GPU_ID"].duplicated().to_numpy()
+    return pd.Series(np.flatnonzero(first), index=pd.Index(df["GPU_ID"].to_numpy()[first]))
@@ -0,0 +1,203 @@
+"""PDF reports for the dashboard, built on a worker thread into temp files."""
+import atexit
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# GPUs formatted and drawn per block; only one block of strings exists at a time
+REPORT_BLOCK_ROWS = int(os.getenv("REPORT_BLOCK_ROWS", "5000"))
+# Finished reports kept on disk (per dashboard process) before the oldest is deleted
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "8"))
+
+# US letter in points (reportlab.lib.pagesizes.letter); reportlab itself is
+# only imported once a report is built, not when the dashboard starts.
+WIDTH, HEIGHT = 612.0, 792.0
+TOP = HEIGHT - 50
+BOTTOM = 60
+ROW_HEIGHT = 14
+
+
+def _text(values):
+    return np.asarray(values).astype(str).tolist()
+
+
+def _score(values):
+    return np.char.mod("%.1f", np.asarray(values, dtype=float)).tolist()
+
+
+def draw_table(c, y, title, columns, blocks, on_block=None):
+    """Draw a paginated table and return the y position below it.
+
+    columns is a list of (header, x) pairs and blocks yields one list of cell
+    strings per column. Each page gets one text object per column instead of
+    a drawString call per cell, and the header is repeated on every page.
+    """
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y, title)
+    y -= 18
+    header = True
+    for cells in blocks:
+        n, start = len(cells[0]), 0
+        while start < n:
+            if y - ROW_HEIGHT < BOTTOM:
+                c.showPage()
+                y, header = TOP, True
+            if header:
+                c.setFont("Helvetica-Bold", 10)
+                for label, x in columns:
+                    c.drawString(x, y, label)
+                y -= ROW_HEIGHT
+                header = False
+            stop = min(n, start + int((y - BOTTOM) // ROW_HEIGHT))
+            for (_, x), column in zip(columns, cells):
+                text = c.beginText(x, y)
+                text.setFont("Helvetica", 9)
+                text.setLeading(ROW_HEIGHT)
+                text.textLines(column[start:stop])
+                c.drawText(text)
+            y -= (stop - start) * ROW_HEIGHT
+            start = stop
+        if on_block is not None:
+            on_block(n)
+    return y - 10
+
+
+def write_fleet_report(path, df, summary, progress=None):
+    """Write the full lifecycle report for one batch to path.
+
+    summary holds the Health Summary figures (avg_life, most_common,
+    high_risk). progress(done, total) is called after every block of GPUs.
+    """
+    anomalies = df.loc[df["Anomaly_Label"] == "Anomaly", ["GPU_ID", "Anomaly_Score"]]
+    health = df["health_class"] if "health_class" in df.columns else df["Predicted_Class"]
+    total = len(anomalies) + len(df)
+    done = 0
+
+    def advance(rows):
+        nonlocal done
+        done += rows
+        if progress is not None:
+            progress(done, total)
+
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=(WIDTH, HEIGHT))
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(160, HEIGHT - 50, "Processor Lifecycle Summary Report")
+    c.setFont("Helvetica", 12)
+    c.drawString(50, HEIGHT - 80, f"Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    c.drawString(50, HEIGHT - 100, f"Total GPUs Analyzed: {len(df)}")
+    c.drawString(50, HEIGHT - 130, f"Average Life Score: {summary['avg_life']:.2f} / 100")
+    c.drawString(50, HEIGHT - 150, f"Most Common Condition: {summary['most_common']}")
+    c.drawString(50, HEIGHT - 170, f"High-Risk Units: {summary['high_risk']}")
+
+    y = HEIGHT - 200
+    if anomalies.empty:
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(50, y, "Detected Anomalies: 0")
+        c.setFont("Helvetica", 10)
+        c.drawString(60, y - 18, "No anomalies detected.")
+        y -= 46
+    else:
+        blocks = ([_text(b["GPU_ID"]), _score(b["Anomaly_Score"])]
+                  for b in (anomalies.iloc[i:i + REPORT_BLOCK_ROWS]
+                            for i in range(0, len(anomalies), REPORT_BLOCK_ROWS)))
+        y = draw_table(c, y, f"Detected Anomalies: {len(anomalies)}",
+                       [("GPU_ID", 60), ("Anomaly Score", 260)], blocks, advance)
+
+    blocks = ([_text(df["GPU_ID"].iloc[i:i + REPORT_BLOCK_ROWS]),
+               _text(health.iloc[i:i + REPORT_BLOCK_ROWS]),
+               _score(df["life_score"].iloc[i:i + REPORT_BLOCK_ROWS])]
+              for i in range(0, len(df), REPORT_BLOCK_ROWS))
+    draw_table(c, y, "GPU Summary:", [("GPU_ID", 50), ("Class", 200), ("Life Score", 420)],
+               blocks, advance)
+    c.save()
+
+
+def write_comparison_report(path, gpu1, gpu2, gpu_a, gpu_b, progress=None):
+    """Write the side-by-side report for two GPUs (rows of the batch frame)."""
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=(WIDTH, HEIGHT))
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, HEIGHT - 50, f"GPU Comparison Report: GPU {gpu1} vs GPU {gpu2}")
+    c.setFont("Helvetica", 12)
+    c.drawString(50, HEIGHT - 80, f"Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    y_position = HEIGHT - 120
+    for col, label in [("health_class", "Health"), ("life_score", "Life Score"), ("usage_hours", "Usage Hours"),
+                       ("avg_power_watts", "Avg Power (W)"), ("peak_power_watts", "Peak Power (W)"),
+                       ("avg_sm_pct", "Avg Compute (%)"), ("avg_mem_pct", "Avg Memory (%)"),
+                       ("thermal_score", "Thermal Score")]:
+        c.drawString(50, y_position, f"{label} GPU {gpu1}: {gpu_a.get(col, 'N/A')}")
+        c.drawString(300, y_position, f"{label} GPU {gpu2}: {gpu_b.get(col, 'N/A')}")
+        y_position -= 20
+    gpu_a_eff = gpu_a.get("avg_sm_pct", 0) / max(gpu_a.get("avg_power_watts", 1), 1)
+    gpu_b_eff = gpu_b.get("avg_sm_pct", 0) / max(gpu_b.get("avg_power_watts", 1), 1)
+    c.drawString(50, y_position - 10, f"Efficiency Score GPU {gpu1}: {gpu_a_eff:.2f}")
+    c.drawString(300, y_position - 10, f"Efficiency Score GPU {gpu2}: {gpu_b_eff:.2f}")
+    y_position -= 30
+    c.drawString(50, y_position, f"Recommendation GPU {gpu1}: {gpu_a['Workload']}")
+    c.drawString(300, y_position, f"Recommendation GPU {gpu2}: {gpu_b['Workload']}")
+    c.save()
+    if progress is not None:
+        progress(2, 2)
+
+
+class ReportService:
+    """Builds reports in the background and keeps finished ones by key.
+
+    One instance is shared by every dashboard session in the process, so a
+    report requested for a batch_id is built once and then served to everyone.
+    Each report gets its own file in a private temp directory that is removed
+    when the process exits.
+    """
+
+    def __init__(self, workers=1, keep=REPORT_CACHE_SIZE):
+        self.dir = tempfile.mkdtemp(prefix="recore-reports-")
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="report")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        atexit.register(shutil.rmtree, self.dir, True)
+
+    def submit(self, key, build, *args):
+        """Start build(path, *args, progress=...) for key unless it is already queued, running or done."""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job["status"] != "failed":
+                return job
+            fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.dir)
+            os.close(fd)
+            job = {"status": "queued", "done": 0, "total": 0, "path": path, "error": None}
+            self._jobs[key] = job
+            self._evict()
+        self._pool.submit(self._run, job, build, args)
+        return job
+
+    def get(self, key):
+        return self._jobs.get(key)
+
+    def _run(self, job, build, args):
+        def progress(done, total):
+            job["done"], job["total"] = done, total
+
+        job["status"] = "running"
+        try:
+            build(job["path"], *args, progress=progress)
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+
+    def _evict(self):
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for key in finished[:max(0, len(finished) - self.keep)]:
+            job = self._jobs.pop(key)
+            if os.path.exists(job["path"]):
+                os.remove(job["path"])
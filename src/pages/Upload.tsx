@@ -9,6 +9,8 @@ import { useToast } from "@/hooks/use-toast";
 
 const Upload = () => {
   const [file, setFile] = useState<File | null>(null);
+  // One key per selected file, so retrying the same upload returns the stored batch
+  const [uploadKey, setUploadKey] = useState<string>(() => crypto.randomUUID());
   const [uploading, setUploading] = useState(false);
   const [uploadComplete, setUploadComplete] = useState(false);
   const { toast } = useToast();
@@ -22,6 +24,7 @@ const Upload = () => {
     const droppedFile = e.dataTransfer.files[0];
     if (droppedFile && droppedFile.name.endsWith(".csv")) {
       setFile(droppedFile);
+      setUploadKey(crypto.randomUUID());
     } else {
       toast({
         title: "Invalid file type",
@@ -34,6 +37,7 @@ const Upload = () => {
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files && e.target.files[0]) {
       setFile(e.target.files[0]);
+      setUploadKey(crypto.randomUUID());
     }
   };
 
@@ -56,6 +60,7 @@ const Upload = () => {
       const response = await fetch("https://processor-lifecycle-est.onrender.com/predict", {
 
         method: "POST",
+        headers: { "Idempotency-Key": uploadKey },
         body: formData,
       });
 